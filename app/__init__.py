@@ -3,18 +3,64 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
+from sqlalchemy.pool import StaticPool
 
 db = SQLAlchemy()
 migrate = Migrate()
 
 
+def _engine_options(database_uri):
+    """Connection pool and statement cache settings for the configured database."""
+    options = {
+        'pool_pre_ping': True,
+        'query_cache_size': 1200,  # Compiled SQL cache entries (SQLAlchemy default is 500)
+    }
+
+    # An in-memory SQLite database lives in one connection; share it across threads
+    if database_uri in ('sqlite://', 'sqlite:///:memory:'):
+        options.update({
+            'poolclass': StaticPool,
+            'connect_args': {'check_same_thread': False},
+        })
+
+    # SQLite uses its own single-connection pools; only tune pooling for server databases
+    if not database_uri.startswith('sqlite'):
+        options.update({
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+            'pool_recycle': 1800,
+        })
+
+    # psycopg 3: server-side prepare statements after they run a few times
+    if database_uri.startswith('postgresql+psycopg:'):
+        options['connect_args'] = {'prepare_threshold': 5}
+
+    return options
+
+
 def create_app(config_name=None):
     app = Flask(__name__)
 
+    # Fast JSON serialization for all jsonify() responses
+    from app.json_provider import ORJSONProvider
+    app.json = ORJSONProvider(app)
+
     # Configuration
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///news.db')
+    if config_name == 'testing':
+        # Tests get a private in-memory database, never DATABASE_URL
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    # LLM settings are read once; the environment doesn't change at runtime
+    app.config['LLM_ENABLED'] = os.getenv('LLM_ENABLED', 'false').lower() == 'true'
+    app.config['LLM_PROVIDER'] = os.getenv('LLM_PROVIDER', 'anthropic')
+
+    from app.services.llm_client import LLMClientFactory
+    app.extensions['llm_available'] = LLMClientFactory.is_available()
 
     # Initialize extensions
     db.init_app(app)
@@ -28,6 +74,10 @@ def create_app(config_name=None):
         origins = '*'
     CORS(app, origins=origins)
 
+    # Short-TTL cache for aggregate endpoints
+    from app.cache import init_cache
+    init_cache(app)
+
     # Register blueprints
     from app.routes.feeds import feeds_bp
     from app.routes.articles import articles_bp
@@ -0,0 +1,92 @@
+"""Short-TTL in-process cache for read-heavy aggregate endpoints."""
+import os
+import threading
+import time
+from functools import wraps
+from typing import Any, Hashable, Optional
+from flask import current_app, request, make_response
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire after a fixed number of seconds."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value for the configured TTL."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._data.clear()
+
+
+def init_cache(app):
+    """Attach a response cache to the app (RESPONSE_CACHE_TTL seconds, 0 disables)."""
+    app.config.setdefault('RESPONSE_CACHE_TTL', float(os.getenv('RESPONSE_CACHE_TTL', 15)))
+    app.extensions['response_cache'] = TTLCache(app.config['RESPONSE_CACHE_TTL'])
+
+
+def invalidate_cache():
+    """Clear cached responses, e.g. after new articles are stored."""
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.clear()
+
+
+def cached_response(view=None, *, version=None):
+    """
+    Cache a view's successful response keyed by endpoint and query args.
+
+    ``version`` is an optional callable whose result joins the key, so a
+    cheap data-version probe (e.g. MAX(updated_at)) invalidates entries as
+    soon as the underlying rows change.
+
+    Adds an X-Cache: HIT/MISS header so clients can tell which they got.
+    """
+    if view is None:
+        return lambda func: cached_response(func, version=version)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = current_app.extensions.get('response_cache')
+        if cache is None or cache.ttl <= 0:
+            return view(*args, **kwargs)
+
+        key = (request.endpoint, tuple(sorted(request.args.items(multi=True))))
+        if version is not None:
+            key += (version(),)
+        cached = cache.get(key)
+        if cached is not None:
+            body, mimetype = cached
+            response = current_app.response_class(body, mimetype=mimetype)
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        if response.is_streamed:
+            # Buffering a streamed body would defeat the point of streaming it
+            return response
+        if response.status_code == 200:
+            cache.set(key, (response.get_data(), response.mimetype))
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
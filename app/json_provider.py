@@ -0,0 +1,36 @@
+"""orjson-backed JSON provider for Flask responses."""
+from collections.abc import Mapping
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Encode and decode JSON with orjson.
+
+    orjson serializes datetimes natively (ISO 8601), so models can return
+    datetime values directly instead of pre-formatting them. Timezone-aware
+    UTC values are written with a ``Z`` suffix; naive values are unchanged.
+    """
+
+    option = orjson.OPT_UTC_Z
+
+    @staticmethod
+    def default(o):
+        # Row mappings from Core selects serialize like plain dicts
+        if isinstance(o, Mapping):
+            return dict(o)
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option),
+            mimetype=self.mimetype
+        )
@@ -1,5 +1,26 @@
 from app.models.feed import Feed
-from app.models.article import Article
+from app.models.article import Article, NEWEST_FIRST, newest_first_after, newest_first_cursor
 from app.models.topic import Topic, ArticleTopic
 
-__all__ = ['Feed', 'Article', 'Topic', 'ArticleTopic']
+# Columns serialized by Article.to_dict(), for list queries that skip ORM hydration.
+# Select them with .outerjoin(Feed, Article.feed_id == Feed.id).
+ARTICLE_LIST_COLUMNS = (
+    Article.id,
+    Article.feed_id,
+    Feed.name.label('feed_name'),
+    Article.guid,
+    Article.title,
+    Article.link,
+    Article.description,
+    Article.author,
+    Article.thumbnail,
+    Article.published_at,
+    Article.fetched_at,
+    Article.is_read,
+    Article.is_starred,
+)
+
+__all__ = [
+    'Feed', 'Article', 'Topic', 'ArticleTopic', 'ARTICLE_LIST_COLUMNS',
+    'NEWEST_FIRST', 'newest_first_after', 'newest_first_cursor',
+]
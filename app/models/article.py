@@ -1,4 +1,6 @@
 from datetime import datetime
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.dialects.postgresql import JSONB
 from app import db
 
 
@@ -20,18 +22,31 @@ class Article(db.Model):
     is_starred = db.Column(db.Boolean, default=False)
 
     # LLM analysis fields
-    llm_category = db.Column(db.String(100), index=True)  # Politics, Technology, etc.
+    llm_category = db.Column(db.String(100))  # Politics, Technology, etc.
     llm_sentiment = db.Column(db.String(20))  # positive, negative, neutral
     analysis_status = db.Column(db.String(20), index=True, default='pending')  # pending, processing, completed, failed
     analyzed_at = db.Column(db.DateTime)
-    llm_metadata = db.Column(db.JSON)  # entities, topics, key_facts
+    llm_metadata = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'))  # entities, topics, key_facts
     content_hash = db.Column(db.String(64))  # SHA-256 hash to detect content changes
 
+    # Relationship
+    feed = db.relationship('Feed', back_populates='articles')
+
     # Index for faster queries
     __table_args__ = (
         db.Index('idx_feed_published', 'feed_id', 'published_at'),
         db.Index('idx_published', 'published_at'),
         db.Index('idx_analysis_status', 'analysis_status'),
+        # Similar-articles lookup: filter by LLM category, newest first
+        db.Index('idx_category_published', 'llm_category', published_at.desc()),
+        # Partial indexes covering only the minority unread/starred rows
+        db.Index('idx_unread', 'published_at',
+                 postgresql_where=text('is_read = false'), sqlite_where=text('is_read = 0')),
+        db.Index('idx_starred', 'published_at',
+                 postgresql_where=text('is_starred = true'), sqlite_where=text('is_starred = 1')),
+        # GIN index for @> containment queries on entities/topics (Postgres only)
+        db.Index('idx_llm_metadata_gin', 'llm_metadata', postgresql_using='gin',
+                 postgresql_ops={'llm_metadata': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
     )
 
     def to_dict(self, include_content=False, include_llm=False):
@@ -45,8 +60,8 @@ class Article(db.Model):
             'description': self.description,
             'author': self.author,
             'thumbnail': self.thumbnail,
-            'published_at': self.published_at.isoformat() if self.published_at else None,
-            'fetched_at': self.fetched_at.isoformat() if self.fetched_at else None,
+            'published_at': self.published_at,
+            'fetched_at': self.fetched_at,
             'is_read': self.is_read,
             'is_starred': self.is_starred,
         }
@@ -56,9 +71,61 @@ class Article(db.Model):
             data['llm_category'] = self.llm_category
             data['llm_sentiment'] = self.llm_sentiment
             data['analysis_status'] = self.analysis_status
-            data['analyzed_at'] = self.analyzed_at.isoformat() if self.analyzed_at else None
+            data['analyzed_at'] = self.analyzed_at
             data['llm_metadata'] = self.llm_metadata
         return data
 
     def __repr__(self):
         return f'<Article {self.title[:50]}>'
+
+
+# Full-text search document over title + description. On Postgres it is backed
+# by a GIN expression index; queries must use this same expression to hit it.
+SEARCH_DOCUMENT = func.to_tsvector(
+    text("'english'"),
+    func.coalesce(Article.title, '') + ' ' + func.coalesce(Article.description, '')
+)
+
+db.Index('idx_article_search', SEARCH_DOCUMENT, postgresql_using='gin').ddl_if(dialect='postgresql')
+
+# Covering index for the ORDER BY published_at DESC list pages: carries the list
+# columns so Postgres can answer them with an index-only scan. Elsewhere
+# idx_published serves the sort.
+db.Index(
+    'idx_published_covering',
+    Article.published_at.desc(),
+    postgresql_include=['id', 'feed_id', 'title', 'link', 'thumbnail', 'is_read', 'is_starred'],
+).ddl_if(dialect='postgresql')
+
+# Newest-first order of the keyset-paged endpoints; undated articles come last
+NEWEST_FIRST = (Article.published_at.desc().nulls_last(), Article.id.desc())
+
+# Serves NEWEST_FIRST on Postgres, where a plain DESC index sorts NULLs first
+db.Index(
+    'idx_published_id_nulls_last',
+    Article.published_at.desc().nulls_last(),
+    Article.id.desc(),
+).ddl_if(dialect='postgresql')
+
+
+def newest_first_after(published_at, article_id):
+    """
+    Filter for the articles that follow a keyset cursor in NEWEST_FIRST order.
+
+    A published_at of None means the cursor is inside the undated tail.
+    """
+    if published_at is None:
+        return and_(Article.published_at.is_(None), Article.id < article_id)
+    return or_(
+        Article.published_at < published_at,
+        and_(Article.published_at == published_at, Article.id < article_id),
+        Article.published_at.is_(None),
+    )
+
+
+def newest_first_cursor(published_at, article_id) -> dict:
+    """Query params that resume NEWEST_FIRST paging after the given article."""
+    cursor = {'before_id': article_id}
+    if published_at is not None:
+        cursor['before_published_at'] = published_at.isoformat()
+    return cursor
@@ -1,5 +1,9 @@
+from collections import Counter
 from datetime import datetime
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
 from app import db
+from app.models.article import Article
 
 
 class Feed(db.Model):
@@ -12,11 +16,15 @@ class Feed(db.Model):
     category = db.Column(db.String(100))
     is_active = db.Column(db.Boolean, default=True)
     last_fetched = db.Column(db.DateTime)
+    # HTTP validators from the last fetch, sent back for conditional GETs
+    etag = db.Column(db.String(255))
+    last_modified = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    article_count = db.Column(db.Integer, default=0, nullable=False)  # Denormalized, see _sync_article_counts
 
     # Relationship
-    articles = db.relationship('Article', backref='feed', lazy='dynamic', cascade='all, delete-orphan')
+    articles = db.relationship('Article', back_populates='feed', cascade='all, delete-orphan')
 
     def to_dict(self):
         return {
@@ -26,10 +34,36 @@ class Feed(db.Model):
             'description': self.description,
             'category': self.category,
             'is_active': self.is_active,
-            'last_fetched': self.last_fetched.isoformat() if self.last_fetched else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'article_count': self.articles.count()
+            'last_fetched': self.last_fetched,
+            'created_at': self.created_at,
+            'article_count': self.article_count
         }
 
     def __repr__(self):
         return f'<Feed {self.name}>'
+
+
+def adjust_article_count(session, feed_id: int, delta: int) -> None:
+    """Atomically add delta to a feed's article_count without touching updated_at."""
+    session.execute(
+        update(Feed).where(Feed.id == feed_id).values(
+            article_count=Feed.article_count + delta,
+            updated_at=Feed.updated_at
+        )
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_article_counts(session, flush_context):
+    """Keep Feed.article_count in step with articles inserted or deleted through the ORM."""
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Article):
+            deltas[obj.feed_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Article):
+            deltas[obj.feed_id] -= 1
+
+    for feed_id, delta in deltas.items():
+        if feed_id is not None and delta:
+            adjust_article_count(session, feed_id, delta)
@@ -21,7 +21,13 @@ class Topic(db.Model):
     importance_score = db.Column(db.Float, default=0.5)  # 0.0 to 1.0
 
     # Relationship to articles
-    articles = db.relationship('ArticleTopic', backref='topic', lazy='dynamic', cascade='all, delete-orphan')
+    articles = db.relationship('ArticleTopic', backref='topic', cascade='all, delete-orphan')
+
+    __table_args__ = (
+        # Backs list_topics ORDER BY article_count DESC, updated_at DESC and MAX(updated_at)
+        db.Index('idx_topics_count_updated', article_count.desc(), updated_at.desc()),
+        db.Index('idx_topics_updated', 'updated_at'),
+    )
 
     def to_dict(self, include_articles=False):
         data = {
@@ -33,11 +39,11 @@ class Topic(db.Model):
             'article_count': self.article_count,
             'category': self.category,
             'importance_score': self.importance_score,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
         }
         if include_articles:
-            data['articles'] = [at.article.to_dict() for at in self.articles.limit(10).all()]
+            data['articles'] = [at.article.to_dict() for at in self.articles[:10]]
         return data
 
 
@@ -54,4 +60,6 @@ class ArticleTopic(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('article_id', 'topic_id', name='unique_article_topic'),
+        # The unique constraint leads with article_id; topic lookups need topic_id first
+        db.Index('idx_article_topics_topic', 'topic_id', 'article_id'),
     )
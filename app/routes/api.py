@@ -1,10 +1,13 @@
-import os
-from flask import Blueprint, request, jsonify
-from sqlalchemy import desc, func
+import orjson
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from sqlalchemy import desc, func, case, select
+from sqlalchemy.orm import joinedload, raiseload
 from datetime import datetime, timedelta
 from app import db
-from app.models import Feed, Article
-from app.services import FeedFetcher
+from app.cache import cached_response
+from app.utils import parse_iso_datetime
+from app.models import Feed, Article, ARTICLE_LIST_COLUMNS, NEWEST_FIRST, newest_first_after, newest_first_cursor
+from app.services import FeedFetcher, ArticleAnalyzer, TopicAnalyzer
 
 api_bp = Blueprint('api', __name__)
 
@@ -14,22 +17,27 @@ def health_check():
     """Health check endpoint."""
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.utcnow()
     })
 
 
 @api_bp.route('/stats', methods=['GET'])
+@cached_response
 def get_stats():
     """Get overall statistics."""
-    total_feeds = Feed.query.count()
-    active_feeds = Feed.query.filter_by(is_active=True).count()
-    total_articles = Article.query.count()
-    unread_articles = Article.query.filter_by(is_read=False).count()
-    starred_articles = Article.query.filter_by(is_starred=True).count()
+    total_feeds, active_feeds = db.session.query(
+        func.count(Feed.id),
+        func.coalesce(func.sum(case((Feed.is_active == True, 1), else_=0)), 0)
+    ).one()
 
-    # Articles in last 24 hours
+    # All article counts in a single pass (last 24h by fetch time)
     yesterday = datetime.utcnow() - timedelta(days=1)
-    recent_articles = Article.query.filter(Article.fetched_at >= yesterday).count()
+    total_articles, unread_articles, starred_articles, recent_articles = db.session.query(
+        func.count(Article.id),
+        func.coalesce(func.sum(case((Article.is_read == False, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Article.is_starred == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Article.fetched_at >= yesterday, 1), else_=0)), 0)
+    ).one()
 
     return jsonify({
         'feeds': {
@@ -46,6 +54,7 @@ def get_stats():
 
 
 @api_bp.route('/categories', methods=['GET'])
+@cached_response
 def get_categories():
     """Get all categories with article counts."""
     categories = db.session.query(
@@ -74,15 +83,20 @@ def get_news():
     - since: ISO timestamp - get articles published after this time
     - until: ISO timestamp - get articles published before this time
     - limit: Max articles to return (default 50, max 200)
-    - offset: Skip first N articles
+    - before_published_at, before_id: Keyset cursor - return articles after this one
+      (use meta.next_cursor from the previous page; undated articles come last and
+      their cursor has only before_id)
+    - offset: Skip first N articles (legacy; prefer the cursor for deep pages)
     - unread_only: Only return unread articles (true/false)
+    - include_total: Also return the total match count (true/false, default false)
     """
-    query = Article.query
+    # Select bare columns rather than hydrating Article objects
+    query = select(*ARTICLE_LIST_COLUMNS).outerjoin(Feed, Article.feed_id == Feed.id)
 
     # Category filter
     category = request.args.get('category')
     if category:
-        query = query.join(Feed).filter(Feed.category == category)
+        query = query.filter(Feed.category == category)
 
     # Feed filter
     feed_id = request.args.get('feed_id', type=int)
@@ -93,7 +107,7 @@ def get_news():
     since = request.args.get('since')
     if since:
         try:
-            since_dt = datetime.fromisoformat(since.replace('Z', '+00:00'))
+            since_dt = parse_iso_datetime(since)
             query = query.filter(Article.published_at >= since_dt)
         except ValueError:
             pass
@@ -101,7 +115,7 @@ def get_news():
     until = request.args.get('until')
     if until:
         try:
-            until_dt = datetime.fromisoformat(until.replace('Z', '+00:00'))
+            until_dt = parse_iso_datetime(until)
             query = query.filter(Article.published_at <= until_dt)
         except ValueError:
             pass
@@ -114,20 +128,46 @@ def get_news():
     # Pagination
     limit = min(request.args.get('limit', 50, type=int), 200)
     offset = request.args.get('offset', 0, type=int)
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
 
-    # Order and fetch
-    query = query.order_by(desc(Article.published_at))
-    total = query.count()
-    articles = query.offset(offset).limit(limit).all()
+    total = None
+    if include_total:
+        total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
 
+    # Keyset cursor: seek past the last (published_at, id) seen instead of OFFSET
+    before_published_at = request.args.get('before_published_at')
+    before_id = request.args.get('before_id', type=int)
+    if before_id:
+        try:
+            cursor_dt = parse_iso_datetime(before_published_at) if before_published_at else None
+            query = query.filter(newest_first_after(cursor_dt, before_id))
+            offset = 0
+        except ValueError:
+            pass
+
+    # Order and fetch one extra row to detect further pages
+    query = query.order_by(*NEWEST_FIRST)
+    rows = db.session.execute(query.offset(offset).limit(limit + 1)).mappings().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = newest_first_cursor(rows[-1]['published_at'], rows[-1]['id'])
+
+    meta = {
+        'limit': limit,
+        'offset': offset,
+        'has_more': has_more,
+        'next_cursor': next_cursor
+    }
+    if include_total:
+        meta['total'] = total
+
+    # Row mappings go straight to the orjson encoder, no per-row to_dict()
     return jsonify({
-        'news': [a.to_dict() for a in articles],
-        'meta': {
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'has_more': (offset + len(articles)) < total
-        }
+        'news': rows,
+        'meta': meta
     })
 
 
@@ -136,20 +176,49 @@ def get_news_stream():
     """
     Get a continuous stream format of news.
     Returns articles in a format suitable for streaming clients.
+
+    Query params:
+    - since: ISO timestamp - get articles fetched after this time
+    - limit: Max articles to return (default 100, max 500)
+    - format: 'ndjson' to stream one article per line instead of a JSON envelope
+      (also selected by Accept: application/x-ndjson)
     """
     since = request.args.get('since')
     limit = min(request.args.get('limit', 100, type=int), 500)
 
-    query = Article.query
+    query = Article.query.options(
+        joinedload(Article.feed).load_only(Feed.name),
+        raiseload('*')
+    )
 
     if since:
         try:
-            since_dt = datetime.fromisoformat(since.replace('Z', '+00:00'))
+            since_dt = parse_iso_datetime(since)
             query = query.filter(Article.fetched_at > since_dt)
         except ValueError:
             pass
 
-    articles = query.order_by(desc(Article.fetched_at)).limit(limit).all()
+    query = query.order_by(desc(Article.fetched_at)).limit(limit)
+
+    wants_ndjson = (
+        request.args.get('format') == 'ndjson'
+        or request.accept_mimetypes.best == 'application/x-ndjson'
+    )
+    if wants_ndjson:
+        json_provider = current_app.json
+
+        def generate():
+            # Hydrate rows in small chunks so memory stays flat for large limits
+            for article in query.yield_per(100):
+                yield orjson.dumps(
+                    article.to_dict(),
+                    default=json_provider.default,
+                    option=json_provider.option
+                ) + b'\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    articles = query.all()
 
     # Get latest timestamp for next poll
     latest = articles[0].fetched_at if articles else datetime.utcnow()
@@ -157,8 +226,8 @@ def get_news_stream():
     return jsonify({
         'items': [a.to_dict() for a in articles],
         'count': len(articles),
-        'latest': latest.isoformat(),
-        'poll_after': latest.isoformat()
+        'latest': latest,
+        'poll_after': latest
     })
 
 
@@ -176,10 +245,9 @@ def refresh_feeds():
 
 
 @api_bp.route('/analysis/status', methods=['GET'])
+@cached_response
 def get_analysis_status():
     """Get the current status of article analysis."""
-    from app.services.llm_client import LLMClientFactory
-
     # Get analysis statistics
     status_counts = db.session.query(
         Article.analysis_status,
@@ -201,9 +269,9 @@ def get_analysis_status():
     failed = next((count for status, count in status_counts if status == 'failed'), 0)
 
     return jsonify({
-        'llm_enabled': os.getenv('LLM_ENABLED', 'false').lower() == 'true',
-        'llm_available': LLMClientFactory.is_available(),
-        'llm_provider': os.getenv('LLM_PROVIDER', 'anthropic'),
+        'llm_enabled': current_app.config['LLM_ENABLED'],
+        'llm_available': current_app.extensions['llm_available'],
+        'llm_provider': current_app.config['LLM_PROVIDER'],
         'progress': {
             'total': total,
             'completed': completed,
@@ -219,11 +287,7 @@ def get_analysis_status():
 @api_bp.route('/analysis/trigger', methods=['POST'])
 def trigger_analysis():
     """Manually trigger article analysis and topic creation."""
-    from app.services.llm_client import LLMClientFactory
-    from app.services.article_analyzer import ArticleAnalyzer
-    from app.services.topic_analyzer import TopicAnalyzer
-
-    if not LLMClientFactory.is_available():
+    if not current_app.extensions['llm_available']:
         return jsonify({
             'error': 'LLM is not configured or available',
             'message': 'Set LLM_ENABLED=true and provide API key'
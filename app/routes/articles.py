@@ -1,10 +1,20 @@
-from flask import Blueprint, request, jsonify
-from sqlalchemy import desc
+from flask import Blueprint, abort, request, jsonify
+from sqlalchemy import desc, func, select, text, update
+from sqlalchemy.orm import joinedload, raiseload
 from app import db
-from app.models import Article, Feed
+from app.cache import invalidate_cache
+from app.models import Article, Feed, ARTICLE_LIST_COLUMNS
+from app.models.article import SEARCH_DOCUMENT
 
 articles_bp = Blueprint('articles', __name__)
 
+# RETURNING cannot join, so the feed name comes from a correlated subquery
+_RETURNING_COLUMNS = tuple(
+    select(Feed.name).where(Feed.id == Article.feed_id).scalar_subquery().label('feed_name')
+    if column.key == 'feed_name' else column
+    for column in ARTICLE_LIST_COLUMNS
+)
+
 
 @articles_bp.route('', methods=['GET'])
 def list_articles():
@@ -16,11 +26,13 @@ def list_articles():
     - category: Filter by feed category
     - is_read: Filter by read status (true/false)
     - is_starred: Filter by starred status (true/false)
-    - search: Search in title and description
+    - search: Search in title and description (full-text on Postgres)
     - page: Page number (default 1)
     - per_page: Items per page (default 20, max 100)
+    - include_total: Also return total/pages counts (true/false, default false)
     """
-    query = Article.query
+    # Select bare columns rather than hydrating Article objects
+    query = select(*ARTICLE_LIST_COLUMNS).outerjoin(Feed, Article.feed_id == Feed.id)
 
     # Filters
     feed_id = request.args.get('feed_id', type=int)
@@ -29,7 +41,7 @@ def list_articles():
 
     category = request.args.get('category')
     if category:
-        query = query.join(Feed).filter(Feed.category == category)
+        query = query.filter(Feed.category == category)
 
     is_read = request.args.get('is_read')
     if is_read is not None:
@@ -41,32 +53,46 @@ def list_articles():
 
     search = request.args.get('search')
     if search:
-        search_term = f'%{search}%'
-        query = query.filter(
-            db.or_(
-                Article.title.ilike(search_term),
-                Article.description.ilike(search_term)
+        if db.engine.dialect.name == 'postgresql':
+            # Full-text search backed by the GIN index on SEARCH_DOCUMENT
+            query = query.filter(
+                SEARCH_DOCUMENT.op('@@')(func.websearch_to_tsquery(text("'english'"), search))
+            )
+        else:
+            search_term = f'%{search}%'
+            query = query.filter(
+                db.or_(
+                    Article.title.ilike(search_term),
+                    Article.description.ilike(search_term)
+                )
             )
-        )
 
     # Pagination
-    page = request.args.get('page', 1, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
 
-    # Order by published date (newest first)
-    query = query.order_by(desc(Article.published_at))
+    total = None
+    if include_total:
+        total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Order by published date (newest first), fetching one extra row to detect a next page
+    query = query.order_by(desc(Article.published_at))
+    rows = db.session.execute(
+        query.offset((page - 1) * per_page).limit(per_page + 1)
+    ).mappings().all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
 
     return jsonify({
-        'articles': [a.to_dict() for a in pagination.items],
+        'articles': rows,
         'pagination': {
-            'page': pagination.page,
-            'per_page': pagination.per_page,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page if total is not None else None,
+            'has_next': has_next,
+            'has_prev': page > 1
         }
     })
 
@@ -76,7 +102,10 @@ def latest_articles():
     """Get the latest articles across all feeds."""
     limit = min(request.args.get('limit', 50, type=int), 100)
 
-    articles = Article.query.order_by(
+    articles = Article.query.options(
+        joinedload(Article.feed).load_only(Feed.name),
+        raiseload('*')
+    ).order_by(
         desc(Article.published_at)
     ).limit(limit).all()
 
@@ -93,40 +122,44 @@ def get_article(article_id):
     return jsonify({'article': article.to_dict(include_content=True)})
 
 
+def _set_article_flags(article_id, message, **values):
+    """Apply a flag change with one UPDATE ... RETURNING and echo the updated row."""
+    row = db.session.execute(
+        update(Article)
+        .where(Article.id == article_id)
+        .values(**values)
+        .returning(*_RETURNING_COLUMNS)
+    ).mappings().one_or_none()
+    if row is None:
+        db.session.rollback()
+        abort(404)
+    db.session.commit()
+    invalidate_cache()
+    return jsonify({'message': message, 'article': row})
+
+
 @articles_bp.route('/<int:article_id>/read', methods=['POST'])
 def mark_read(article_id):
     """Mark article as read."""
-    article = Article.query.get_or_404(article_id)
-    article.is_read = True
-    db.session.commit()
-    return jsonify({'message': 'Marked as read', 'article': article.to_dict()})
+    return _set_article_flags(article_id, 'Marked as read', is_read=True)
 
 
 @articles_bp.route('/<int:article_id>/unread', methods=['POST'])
 def mark_unread(article_id):
     """Mark article as unread."""
-    article = Article.query.get_or_404(article_id)
-    article.is_read = False
-    db.session.commit()
-    return jsonify({'message': 'Marked as unread', 'article': article.to_dict()})
+    return _set_article_flags(article_id, 'Marked as unread', is_read=False)
 
 
 @articles_bp.route('/<int:article_id>/star', methods=['POST'])
 def star_article(article_id):
     """Star/favorite an article."""
-    article = Article.query.get_or_404(article_id)
-    article.is_starred = True
-    db.session.commit()
-    return jsonify({'message': 'Article starred', 'article': article.to_dict()})
+    return _set_article_flags(article_id, 'Article starred', is_starred=True)
 
 
 @articles_bp.route('/<int:article_id>/unstar', methods=['POST'])
 def unstar_article(article_id):
     """Unstar an article."""
-    article = Article.query.get_or_404(article_id)
-    article.is_starred = False
-    db.session.commit()
-    return jsonify({'message': 'Article unstarred', 'article': article.to_dict()})
+    return _set_article_flags(article_id, 'Article unstarred', is_starred=False)
 
 
 @articles_bp.route('/mark-all-read', methods=['POST'])
@@ -140,5 +173,37 @@ def mark_all_read():
 
     count = query.update({'is_read': True})
     db.session.commit()
+    invalidate_cache()
 
     return jsonify({'message': f'Marked {count} articles as read'})
+
+
+@articles_bp.route('/mark-read', methods=['POST'])
+def bulk_mark_read():
+    """
+    Set the read status of many articles in a single UPDATE.
+
+    Request body:
+    - ids: List of article IDs
+    - is_read: Read status to set (default true)
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+
+    # bool is an int subclass, so rule it out explicitly
+    if (not isinstance(ids, list) or not ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        return jsonify({'error': 'ids must be a non-empty list of integers'}), 400
+
+    is_read = data.get('is_read', True)
+    if not isinstance(is_read, bool):
+        return jsonify({'error': 'is_read must be true or false'}), 400
+
+    result = db.session.execute(
+        update(Article).where(Article.id.in_(ids)).values(is_read=is_read)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    invalidate_cache()
+
+    return jsonify({'message': f'Updated {result.rowcount} articles', 'updated': result.rowcount})
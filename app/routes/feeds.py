@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from app import db
+from app.cache import invalidate_cache
 from app.models import Feed
 from app.services import FeedFetcher, RSSParser
 
@@ -49,6 +50,7 @@ def create_feed():
 
     db.session.add(feed)
     db.session.commit()
+    invalidate_cache()
 
     # Optionally fetch articles immediately
     if data.get('fetch_now', True):
@@ -92,6 +94,7 @@ def update_feed(feed_id):
         feed.is_active = data['is_active']
 
     db.session.commit()
+    invalidate_cache()
     return jsonify({'message': 'Feed updated', 'feed': feed.to_dict()})
 
 
@@ -102,6 +105,7 @@ def delete_feed(feed_id):
     name = feed.name
     db.session.delete(feed)
     db.session.commit()
+    invalidate_cache()
     return jsonify({'message': f'Feed "{name}" deleted'})
 
 
@@ -1,17 +1,94 @@
-from flask import Blueprint, request, jsonify
-from sqlalchemy import desc
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from sqlalchemy import case, desc, exists, func, or_, select, text
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 from app import db
-from app.models import Topic, ArticleTopic, Article
+from app.cache import cached_response, invalidate_cache
+from app.models import Topic, ArticleTopic, Article, Feed, NEWEST_FIRST, newest_first_after, newest_first_cursor
+from app.utils import parse_iso_datetime
 from app.services.topic_analyzer import TopicAnalyzer
 from app.services.llm_client import LLMClientFactory
 import logging
+import re
+import orjson
+from collections import Counter
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
 topics_bp = Blueprint('topics', __name__)
 
+# Keywords that indicate routine/generic news (penalized in /topics/top)
+ROUTINE_KEYWORDS = frozenset({
+    'update', 'report', 'statement', 'announces', 'says',
+    'weekly', 'daily', 'monthly', 'quarterly', 'annual',
+    'routine', 'regular', 'scheduled', 'expected'
+})
+WORD_PATTERN = re.compile(r'\w+')
+
+# Diversity bonus by number of already-selected topics in the same category (2+ -> 0)
+DIVERSITY_BONUS = (1.0, 0.5, 0.0)
+
+
+def count_routine_keywords(text):
+    """Count distinct routine keywords in text with one tokenizing pass and set lookups."""
+    return len(ROUTINE_KEYWORDS.intersection(WORD_PATTERN.findall(text.lower())))
+
+# Prompt templates for /topics/<id>/ask; only the topic, context and question vary
+ASK_SYSTEM_PROMPT = """You are a helpful news assistant. Answer questions based on the provided news articles about the topic "{title}".
+
+Be concise and factual. If the articles don't contain enough information to answer the question, say so.
+Base your answer only on the provided articles, not on external knowledge.
+Keep your response under 200 words."""
+
+ASK_USER_PROMPT = """Here are news articles about "{title}":
+
+{context}
+
+Question: {question}
+
+Please provide a helpful, accurate answer based on these articles."""
+
+ARTICLE_CONTEXT_TEMPLATE = "Article from {source}:\nTitle: {title}\n{description}"
+
+# Load a topic's article links, their articles and feeds in one extra query
+ARTICLES_WITH_FEED = selectinload(Topic.articles).joinedload(ArticleTopic.article).joinedload(Article.feed)
+
+
+def topic_sources(topic_ids, per_topic=5):
+    """Map topic id -> distinct feed names of its first ``per_topic`` linked articles."""
+    if not topic_ids:
+        return {}
+
+    links = select(
+        ArticleTopic.topic_id,
+        ArticleTopic.article_id,
+        func.row_number().over(
+            partition_by=ArticleTopic.topic_id,
+            order_by=ArticleTopic.id
+        ).label('position')
+    ).where(ArticleTopic.topic_id.in_(topic_ids)).subquery()
+
+    rows = db.session.execute(
+        select(links.c.topic_id, Feed.name)
+        .join(Article, Article.id == links.c.article_id)
+        .join(Feed, Feed.id == Article.feed_id)
+        .where(links.c.position <= per_topic)
+        .distinct()
+    ).all()
+
+    sources = {}
+    for topic_id, name in rows:
+        sources.setdefault(topic_id, []).append(name)
+    return sources
+
+
+def topics_version():
+    """Cache version for topic listings: changes whenever a topic is written."""
+    return db.session.execute(select(func.max(Topic.updated_at))).scalar()
+
 
 @topics_bp.route('', methods=['GET'])
+@cached_response(version=topics_version)
 def list_topics():
     """
     List all topics with optional filtering.
@@ -23,10 +100,33 @@ def list_topics():
     limit = min(request.args.get('limit', 20, type=int), 50)
     include_articles = request.args.get('include_articles', 'false').lower() == 'true'
 
-    topics = Topic.query.order_by(
+    query = Topic.query.order_by(
         desc(Topic.article_count),
         desc(Topic.updated_at)
-    ).limit(limit).all()
+    ).limit(limit)
+
+    if include_articles:
+        # Large payload: stream one encoded topic at a time instead of building it all
+        query = query.options(ARTICLES_WITH_FEED)
+        json_provider = current_app.json
+
+        def generate():
+            count = 0
+            yield b'{"topics":['
+            for topic in query.yield_per(25):
+                if count:
+                    yield b','
+                yield orjson.dumps(
+                    topic.to_dict(include_articles=True),
+                    default=json_provider.default,
+                    option=json_provider.option
+                )
+                count += 1
+            yield b'],"count":%d}' % count
+
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
+    topics = query.all()
 
     return jsonify({
         'topics': [t.to_dict(include_articles=include_articles) for t in topics],
@@ -37,7 +137,7 @@ def list_topics():
 @topics_bp.route('/<int:topic_id>', methods=['GET'])
 def get_topic(topic_id):
     """Get a specific topic with its articles."""
-    topic = Topic.query.get_or_404(topic_id)
+    topic = Topic.query.options(ARTICLES_WITH_FEED).get_or_404(topic_id)
     return jsonify({
         'topic': topic.to_dict(include_articles=True)
     })
@@ -55,6 +155,7 @@ def analyze_topics():
 
     try:
         topics = TopicAnalyzer.create_topics(hours=hours)
+        invalidate_cache()
         return jsonify({
             'message': f'Created {len(topics)} topics',
             'topics': [t.to_dict() for t in topics]
@@ -67,13 +168,17 @@ def analyze_topics():
 def refresh_topics():
     """Clear and regenerate all topics."""
     try:
-        # Clear existing topics
-        ArticleTopic.query.delete()
-        Topic.query.delete()
+        # Clear existing topics; TRUNCATE skips per-row deletes and WAL on Postgres
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text('TRUNCATE article_topics, topics RESTART IDENTITY CASCADE'))
+        else:
+            ArticleTopic.query.delete()
+            Topic.query.delete()
         db.session.commit()
 
         # Regenerate
         topics = TopicAnalyzer.create_topics(hours=48)
+        invalidate_cache()
         return jsonify({
             'message': f'Refreshed topics, created {len(topics)}',
             'topics': [t.to_dict() for t in topics]
@@ -84,6 +189,7 @@ def refresh_topics():
 
 
 @topics_bp.route('/top', methods=['GET'])
+@cached_response(version=topics_version)
 def get_top_topics():
     """
     Get top topics for homepage display with smart ranking.
@@ -98,9 +204,8 @@ def get_top_topics():
     - Hard cap of 10 stories
     - Max 3 stories per category for variety
     """
-    from datetime import datetime, timedelta
-
     TOP_STORIES_LIMIT = 15
+    CANDIDATE_LIMIT = 40
     MAX_PER_CATEGORY = 15  # Don't limit by category until categories are properly assigned
 
     # Weight factors
@@ -109,35 +214,52 @@ def get_top_topics():
     WEIGHT_COVERAGE = 0.20
     WEIGHT_DIVERSITY = 0.10
 
-    # Keywords that indicate routine/generic news (penalized)
-    ROUTINE_KEYWORDS = {
-        'update', 'report', 'statement', 'announces', 'says',
-        'weekly', 'daily', 'monthly', 'quarterly', 'annual',
-        'routine', 'regular', 'scheduled', 'expected'
-    }
-
     # Priority categories for rotation
     PRIORITY_CATEGORIES = ['World', 'Technology', 'Politics', 'Science', 'Business',
                            'Health', 'Entertainment', 'Sports', 'Environment']
 
-    # Fetch more candidates than needed for filtering
-    candidates = Topic.query.filter(
-        Topic.article_count >= 1
-    ).order_by(
-        desc(Topic.updated_at)
-    ).limit(100).all()
-
-    if not candidates:
-        return jsonify({'topics': [], 'count': 0})
-
     now = datetime.utcnow()
     six_hours_ago = now - timedelta(hours=6)
 
-    # Calculate max article_count for normalization
-    max_article_count = max(t.article_count for t in candidates) or 1
+    # Max article_count for normalization, computed by the database
+    max_article_count = db.session.execute(
+        select(func.max(Topic.article_count)).where(Topic.article_count >= 1)
+    ).scalar()
+    if not max_article_count:
+        return jsonify({'topics': [], 'count': 0})
+
+    # Pre-rank server-side on an upper bound of the score so only a small
+    # candidate set is loaded; recency is bucketed to its maximum per window
+    prerank = (
+        # Same fallback as base_score: a missing or zero importance counts as 0.5
+        WEIGHT_IMPORTANCE * case(
+            (or_(Topic.importance_score.is_(None), Topic.importance_score == 0), 0.5),
+            else_=Topic.importance_score
+        ) +
+        (WEIGHT_COVERAGE / max_article_count) * Topic.article_count +
+        case(
+            (Topic.updated_at >= six_hours_ago, WEIGHT_RECENCY),
+            (Topic.updated_at >= now - timedelta(hours=24), WEIGHT_RECENCY * 0.5),
+            else_=0.0
+        )
+    )
 
-    def calculate_score(topic, category_counts):
-        """Calculate interestingness score for a topic."""
+    # Fetch more candidates than needed for filtering, as bare scoring columns;
+    # only the selected topics are hydrated into ORM objects below
+    candidates = db.session.execute(
+        select(
+            Topic.id, Topic.importance_score, Topic.article_count, Topic.updated_at,
+            Topic.category, Topic.title, Topic.keywords
+        ).where(
+            Topic.article_count >= 1
+        ).order_by(
+            prerank.desc(),
+            desc(Topic.updated_at)
+        ).limit(CANDIDATE_LIMIT)
+    ).all()
+
+    def base_score(topic):
+        """Return the diversity-independent (weighted score, penalty) for a topic."""
 
         # 1. Importance score (0.0 to 1.0)
         importance = topic.importance_score if topic.importance_score else 0.5
@@ -145,85 +267,74 @@ def get_top_topics():
         # 2. Recency score
         recency = 0.0
         if topic.updated_at:
+            hours_old = (now - topic.updated_at).total_seconds() / 3600
             if topic.updated_at >= six_hours_ago:
                 # Breaking/recent - full boost
-                hours_old = (now - topic.updated_at).total_seconds() / 3600
                 recency = 1.0 - (hours_old / 6.0)  # Linear decay over 6 hours
             else:
                 # Older stories get diminishing score
-                hours_old = (now - topic.updated_at).total_seconds() / 3600
                 recency = max(0.0, 0.5 - (hours_old / 48.0))  # Slow decay
 
         # 3. Coverage score (normalized article count)
         coverage = min(topic.article_count / max_article_count, 1.0)
 
-        # 4. Category diversity bonus
-        category = topic.category or 'General'
-        current_count = category_counts.get(category, 0)
-        diversity = 1.0 if current_count == 0 else 0.5 if current_count == 1 else 0.0
-
-        # Penalty for routine/generic news
-        penalty = 0.0
-        title_lower = (topic.title or '').lower()
-        keywords_lower = (topic.keywords or '').lower()
-        for routine_word in ROUTINE_KEYWORDS:
-            if routine_word in title_lower or routine_word in keywords_lower:
-                penalty += 0.05
-        penalty = min(penalty, 0.3)  # Cap penalty at 30%
-
-        # Calculate weighted score
-        score = (
+        # Penalty for routine/generic news: 5% per distinct routine keyword
+        routine_count = count_routine_keywords(f"{topic.title or ''} {topic.keywords or ''}")
+        penalty = min(0.05 * routine_count, 0.3)  # Cap penalty at 30%
+
+        weighted = (
             WEIGHT_IMPORTANCE * importance +
             WEIGHT_RECENCY * recency +
-            WEIGHT_COVERAGE * coverage +
-            WEIGHT_DIVERSITY * diversity
-        ) * (1.0 - penalty)
+            WEIGHT_COVERAGE * coverage
+        )
+        return weighted, penalty
 
-        return score
+    def final_score(weighted, penalty, current_count):
+        """Add the category diversity bonus (4) and apply the routine penalty."""
+        diversity = DIVERSITY_BONUS[min(current_count, 2)]
+        return (weighted + WEIGHT_DIVERSITY * diversity) * (1.0 - penalty)
 
     # Score and select topics with category diversity enforcement
-    result = []
-    category_counts = {}
+    selected = []
+    category_counts = Counter()
 
-    # First pass: score all candidates
+    # Score each candidate once; only the diversity term changes during selection
     scored_topics = []
     for topic in candidates:
-        # Initial score without diversity (will recalculate during selection)
-        base_score = calculate_score(topic, {})
-        scored_topics.append((topic, base_score))
+        weighted, penalty = base_score(topic)
+        scored_topics.append((final_score(weighted, penalty, 0), weighted, penalty, topic))
 
     # Sort by base score descending
-    scored_topics.sort(key=lambda x: x[1], reverse=True)
+    scored_topics.sort(key=lambda x: x[0], reverse=True)
 
     # Second pass: select with diversity constraints
-    for topic, _ in scored_topics:
-        if len(result) >= TOP_STORIES_LIMIT:
+    for _, weighted, penalty, topic in scored_topics:
+        if len(selected) >= TOP_STORIES_LIMIT:
             break
 
         category = topic.category or 'General'
+        current_count = category_counts[category]
 
         # Enforce max per category
-        if category_counts.get(category, 0) >= MAX_PER_CATEGORY:
+        if current_count >= MAX_PER_CATEGORY:
             continue
 
-        # Recalculate score with current diversity state
-        final_score = calculate_score(topic, category_counts)
-
-        # Add to results
-        topic_dict = topic.to_dict()
-        topic_dict['ranking_score'] = round(final_score, 3)
+        selected.append((topic.id, round(final_score(weighted, penalty, current_count), 3)))
+        category_counts[category] += 1
 
-        # Add source feeds
-        sources = set()
-        for at in topic.articles.limit(5).all():
-            if at.article.feed:
-                sources.add(at.article.feed.name)
-        topic_dict['sources'] = list(sources)
+    # Hydrate the winners and add source feeds of each one's first 5 articles
+    selected_ids = [topic_id for topic_id, _ in selected]
+    topics_by_id = {t.id: t for t in Topic.query.filter(Topic.id.in_(selected_ids))}
+    sources = topic_sources(selected_ids)
 
+    result = []
+    for topic_id, ranking_score in selected:
+        topic_dict = topics_by_id[topic_id].to_dict()
+        topic_dict['ranking_score'] = ranking_score
+        topic_dict['sources'] = sources.get(topic_id, [])
         result.append(topic_dict)
-        category_counts[category] = category_counts.get(category, 0) + 1
 
-    # Final sort by ranking score
+    # Final sort by ranking score (at most TOP_STORIES_LIMIT entries)
     result.sort(key=lambda x: x['ranking_score'], reverse=True)
 
     return jsonify({
@@ -253,54 +364,48 @@ def ask_about_topic(topic_id):
     question = data['question']
 
     # Check if LLM is available
-    if not LLMClientFactory.is_available():
+    if not current_app.extensions['llm_available']:
         return jsonify({
             'error': 'LLM not configured',
             'answer': 'AI Q&A is not available. Please configure an LLM provider (set LLM_ENABLED=true and provide API keys).'
         }), 503
 
     try:
-        # Gather article context
-        article_topics = topic.articles.limit(10).all()
-        articles_context = []
+        # Gather article context: links, articles and feeds in one joined query
+        article_topics = ArticleTopic.query.filter_by(topic_id=topic.id).join(
+            Article, ArticleTopic.article_id == Article.id
+        ).outerjoin(
+            Feed, Article.feed_id == Feed.id
+        ).options(
+            contains_eager(ArticleTopic.article).contains_eager(Article.feed)
+        ).order_by(ArticleTopic.id).limit(10).all()
+        context_blocks = []
         sources = []
 
         for at in article_topics:
             article = at.article
-            articles_context.append({
-                'title': article.title,
-                'description': article.description or '',
-                'source': article.feed.name if article.feed else 'Unknown',
-                'published': article.published_at.isoformat() if article.published_at else ''
-            })
+            source = article.feed.name if article.feed else 'Unknown'
+            context_blocks.append(ARTICLE_CONTEXT_TEMPLATE.format(
+                source=source,
+                title=article.title,
+                description=article.description or ''
+            ))
             sources.append({
                 'title': article.title,
-                'source': article.feed.name if article.feed else 'Unknown',
+                'source': source,
                 'link': article.link
             })
 
         # Build the prompt
-        context_text = "\n\n".join([
-            f"Article from {a['source']}:\nTitle: {a['title']}\n{a['description']}"
-            for a in articles_context
-        ])
-
-        system_prompt = f"""You are a helpful news assistant. Answer questions based on the provided news articles about the topic "{topic.title}".
-
-Be concise and factual. If the articles don't contain enough information to answer the question, say so.
-Base your answer only on the provided articles, not on external knowledge.
-Keep your response under 200 words."""
-
-        user_prompt = f"""Here are news articles about "{topic.title}":
-
-{context_text}
-
-Question: {question}
-
-Please provide a helpful, accurate answer based on these articles."""
+        system_prompt = ASK_SYSTEM_PROMPT.format(title=topic.title)
+        user_prompt = ASK_USER_PROMPT.format(
+            title=topic.title,
+            context="\n\n".join(context_blocks),
+            question=question
+        )
 
         # Get LLM response
-        llm = LLMClientFactory.create()
+        llm = LLMClientFactory.create(current_app.config['LLM_PROVIDER'])
         answer = llm.complete(user_prompt, system=system_prompt, max_tokens=500)
 
         return jsonify({
@@ -323,22 +428,26 @@ def get_similar_articles(topic_id):
     Get articles similar to those in this topic.
 
     Returns articles that share categories, entities, or keywords with the topic's articles.
+
+    Query params:
+    - limit: Max articles to return (default 5, max 10)
+    - before_published_at, before_id: Keyset cursor (use next_cursor from the previous page;
+      undated articles come last and their cursor has only before_id)
     """
     topic = Topic.query.get_or_404(topic_id)
     limit = min(request.args.get('limit', 5, type=int), 10)
 
-    # Get article IDs already in this topic
-    topic_article_ids = [at.article_id for at in topic.articles.all()]
+    in_topic = exists().where(ArticleTopic.topic_id == topic_id)
 
-    if not topic_article_ids:
-        return jsonify({'similar': [], 'count': 0})
+    if not db.session.query(in_topic).scalar():
+        return jsonify({'similar': [], 'count': 0, 'next_cursor': None})
 
     # Get the category of the topic
     topic_category = topic.category
 
-    # Find similar articles not in this topic
-    similar_query = Article.query.filter(
-        Article.id.notin_(topic_article_ids)
+    # Find similar articles not in this topic (anti-join, ids stay in the DB)
+    similar_query = Article.query.options(joinedload(Article.feed)).filter(
+        ~in_topic.where(ArticleTopic.article_id == Article.id)
     )
 
     # Filter by category if available
@@ -347,9 +456,23 @@ def get_similar_articles(topic_id):
             Article.llm_category == topic_category
         )
 
-    similar_articles = similar_query.order_by(
-        desc(Article.published_at)
-    ).limit(limit).all()
+    # Keyset cursor: seek past the last article of the previous page
+    before_published_at = request.args.get('before_published_at')
+    before_id = request.args.get('before_id', type=int)
+    if before_id:
+        try:
+            cursor_dt = parse_iso_datetime(before_published_at) if before_published_at else None
+            similar_query = similar_query.filter(newest_first_after(cursor_dt, before_id))
+        except ValueError:
+            pass
+
+    similar_articles = similar_query.order_by(*NEWEST_FIRST).limit(limit + 1).all()
+    has_more = len(similar_articles) > limit
+    similar_articles = similar_articles[:limit]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = newest_first_cursor(similar_articles[-1].published_at, similar_articles[-1].id)
 
     return jsonify({
         'similar': [
@@ -358,12 +481,13 @@ def get_similar_articles(topic_id):
                 'title': a.title,
                 'thumbnail': a.thumbnail,
                 'source': a.feed.name if a.feed else 'Unknown',
-                'published_at': a.published_at.isoformat() if a.published_at else None,
+                'published_at': a.published_at,
                 'link': a.link
             }
             for a in similar_articles
         ],
-        'count': len(similar_articles)
+        'count': len(similar_articles),
+        'next_cursor': next_cursor
     })
 
 
@@ -373,28 +497,49 @@ def get_topic_images(topic_id):
     Get all images from articles in this topic.
 
     Returns a list of unique images from the topic's articles for gallery display.
+
+    Query params:
+    - limit: Max images to return (default 12, max 20)
+    - after_id: Keyset cursor (use next_cursor from the previous page)
     """
     topic = Topic.query.get_or_404(topic_id)
     limit = min(request.args.get('limit', 12, type=int), 20)
-
-    images = []
-    seen_urls = set()
-
-    for at in topic.articles.all():
-        article = at.article
-        if article.thumbnail and article.thumbnail not in seen_urls:
-            seen_urls.add(article.thumbnail)
-            images.append({
-                'url': article.thumbnail,
-                'title': article.title,
-                'source': article.feed.name if article.feed else 'Unknown',
-                'article_link': article.link
-            })
-            if len(images) >= limit:
-                break
+    after_id = request.args.get('after_id', type=int)
+
+    # First article per distinct thumbnail, deduplicated and limited in SQL
+    first_per_image = select(func.min(Article.id)).join(
+        ArticleTopic, ArticleTopic.article_id == Article.id
+    ).where(
+        ArticleTopic.topic_id == topic_id,
+        Article.thumbnail.isnot(None),
+        Article.thumbnail != ''
+    ).group_by(Article.thumbnail)
+
+    images_query = (
+        select(Article.id, Article.thumbnail, Article.title, Feed.name, Article.link)
+        .outerjoin(Feed, Feed.id == Article.feed_id)
+        .where(Article.id.in_(first_per_image))
+    )
+    if after_id:
+        images_query = images_query.where(Article.id > after_id)
+
+    rows = db.session.execute(images_query.order_by(Article.id).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    images = [
+        {
+            'url': thumbnail,
+            'title': title,
+            'source': source or 'Unknown',
+            'article_link': link
+        }
+        for _, thumbnail, title, source, link in rows
+    ]
 
     return jsonify({
         'images': images,
         'count': len(images),
-        'topic_title': topic.title
+        'topic_title': topic.title,
+        'next_cursor': {'after_id': rows[-1].id} if has_more else None
     })
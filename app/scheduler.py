@@ -1,54 +1,98 @@
+import multiprocessing
 import os
+from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from app import create_app
+from app.services import FeedFetcher
+from app.services.llm_client import LLMClientFactory
+from app.services.article_analyzer import ArticleAnalyzer
+from app.services.topic_analyzer import TopicAnalyzer
 
 
 scheduler = BackgroundScheduler()
 
+# App instance owned by a scheduler worker process, created on first job
+_worker_app = None
+
+
+def _get_worker_app():
+    """Return this process's app, building it from the factory on first use."""
+    global _worker_app
+    if _worker_app is None:
+        _worker_app = create_app()
+    return _worker_app
+
+
+def fetch_job():
+    """Fetch all active feeds (module-level so process executors can pickle it)."""
+    app = _get_worker_app()
+    with app.app_context():
+        results = FeedFetcher.fetch_all_active()
+        app.logger.info(
+            f"Scheduled fetch: {results['total_new']} new, "
+            f"{results['total_updated']} updated, "
+            f"{len(results['errors'])} errors"
+        )
+
+
+def analyze_job():
+    """Run LLM analysis on pending articles and create topics."""
+    app = _get_worker_app()
+    with app.app_context():
+        if not LLMClientFactory.is_available():
+            app.logger.debug("LLM not available, skipping analysis job")
+            return
+
+        try:
+            # Step 1: Analyze pending articles
+            analyzer = ArticleAnalyzer()
+            stats = analyzer.analyze_pending(limit=50)
+            app.logger.info(
+                f"Analysis job: processed={stats['processed']}, "
+                f"succeeded={stats['succeeded']}, failed={stats['failed']}"
+            )
+
+            # Step 2: Create/update topics if articles were analyzed
+            if stats['succeeded'] > 0:
+                topics = TopicAnalyzer.create_topics(use_llm=True)
+                app.logger.info(f"Created {len(topics)} topics with LLM summaries")
+
+        except Exception as e:
+            app.logger.error(f"Analysis job failed: {e}")
+
 
 def init_scheduler(app):
-    """Initialize the background scheduler for periodic feed fetching and analysis."""
+    """
+    Initialize the background scheduler for periodic feed fetching and analysis.
+
+    Jobs run in a pool of SCHEDULER_PROCESSES worker processes (default 2) so
+    feed parsing and analysis don't compete with request handlers for the GIL.
+    Set SCHEDULER_PROCESSES=0 to run them on threads in this process instead;
+    that is the default on SQLite, where extra writer processes mostly wait
+    on the database lock.
+    """
+    global _worker_app
+
+    # Spawned workers re-import the entry module (e.g. run.py); never nest a scheduler
+    if multiprocessing.current_process().name != 'MainProcess':
+        return
+
     fetch_interval = int(os.getenv('FETCH_INTERVAL_MINUTES', 30))
     analyze_interval = int(os.getenv('ANALYZE_INTERVAL_MINUTES', 15))
     llm_enabled = os.getenv('LLM_ENABLED', 'false').lower() == 'true'
+    sqlite = app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite')
+    processes = int(os.getenv('SCHEDULER_PROCESSES', 0 if sqlite else 2))
 
-    def fetch_job():
-        with app.app_context():
-            from app.services import FeedFetcher
-            results = FeedFetcher.fetch_all_active()
-            app.logger.info(
-                f"Scheduled fetch: {results['total_new']} new, "
-                f"{results['total_updated']} updated, "
-                f"{len(results['errors'])} errors"
-            )
-
-    def analyze_job():
-        """Run LLM analysis on pending articles and create topics."""
-        with app.app_context():
-            from app.services.llm_client import LLMClientFactory
-            from app.services.article_analyzer import ArticleAnalyzer
-            from app.services.topic_analyzer import TopicAnalyzer
-
-            if not LLMClientFactory.is_available():
-                app.logger.debug("LLM not available, skipping analysis job")
-                return
-
-            try:
-                # Step 1: Analyze pending articles
-                analyzer = ArticleAnalyzer()
-                stats = analyzer.analyze_pending(limit=50)
-                app.logger.info(
-                    f"Analysis job: processed={stats['processed']}, "
-                    f"succeeded={stats['succeeded']}, failed={stats['failed']}"
-                )
-
-                # Step 2: Create/update topics if articles were analyzed
-                if stats['succeeded'] > 0:
-                    topics = TopicAnalyzer.create_topics(use_llm=True)
-                    app.logger.info(f"Created {len(topics)} topics with LLM summaries")
-
-            except Exception as e:
-                app.logger.error(f"Analysis job failed: {e}")
+    if processes > 0:
+        # Spawn rather than fork: a forked child would inherit this threaded
+        # process's state, including cached LLM clients and their open sockets
+        executor = ProcessPoolExecutor(processes, pool_kwargs={'mp_context': multiprocessing.get_context('spawn')})
+    else:
+        # Threaded jobs share this process, so reuse the running app
+        executor = ThreadPoolExecutor()
+        _worker_app = app
+    scheduler.configure(executors={'default': executor})
 
     # Schedule feed fetching
     scheduler.add_job(
@@ -1,14 +1,31 @@
 """Article analyzer service using LLM for content analysis."""
-import hashlib
+from hashlib import sha256
 import logging
+import os
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+from sqlalchemy import func, literal, select, text, union_all
 from app import db
+from app.cache import invalidate_cache
 from app.models.article import Article
 from app.services.llm_client import LLMClientFactory
 
 logger = logging.getLogger(__name__)
 
+# Max LLM requests in flight during analyze_pending and topic creation
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', 4))
+
+# Estimated prompt-token budget per LLM batch request
+MAX_INPUT_TOKENS = int(os.getenv('LLM_MAX_INPUT_TOKENS', 12000))
+
+# Characters of each description sent to the LLM
+DESCRIPTION_PROMPT_CHARS = 500
+
+# Rows per page when re-hashing completed articles outside Postgres
+REHASH_PAGE_SIZE = 500
+
 # Categories for classification
 CATEGORIES = [
     "Politics",
@@ -32,12 +49,52 @@ ANALYSIS_SYSTEM_PROMPT = """You are a news article analyzer. For each article, e
 
 Respond with a JSON array containing analysis for each article."""
 
+# Reply shape for providers with native structured output (kept to the
+# JSON Schema subset both Anthropic tools and Gemini response_schema accept)
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analyses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "category": {"type": "string", "enum": CATEGORIES},
+                    "sentiment": {"type": "string", "enum": ["positive", "negative", "neutral"]},
+                    "entities": {"type": "array", "items": {"type": "string"}},
+                    "topics": {"type": "array", "items": {"type": "string"}},
+                    "key_facts": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["id", "category", "sentiment"],
+            },
+        },
+    },
+    "required": ["analyses"],
+}
+
+
+def content_hash(title: str, description: Optional[str], content: Optional[str]) -> str:
+    """SHA-256 of title|description|content, hashed from one joined buffer in one call."""
+    return sha256(b'|'.join((
+        str(title).encode('utf-8'),
+        (description or '').encode('utf-8'),
+        (content or '').encode('utf-8'),
+    ))).hexdigest()
+
 
 class ArticleAnalyzer:
     """Analyzes articles using LLM to extract categories, sentiment, entities, etc."""
 
-    def __init__(self, batch_size: int = 10):
+    def __init__(
+        self,
+        batch_size: int = 10,
+        max_concurrency: int = LLM_CONCURRENCY,
+        max_input_tokens: int = MAX_INPUT_TOKENS,
+    ):
         self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_input_tokens = max_input_tokens
         self._client = None
 
     @property
@@ -50,8 +107,37 @@ class ArticleAnalyzer:
     @staticmethod
     def compute_content_hash(article: Article) -> str:
         """Compute SHA-256 hash of article content for change detection."""
-        content = f"{article.title}|{article.description or ''}|{article.content or ''}"
-        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return content_hash(article.title, article.description, article.content)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count (~4 characters per token), good enough for packing."""
+        return len(text) // 4
+
+    def pack_batches(self, articles: List[Article]) -> List[List[Article]]:
+        """
+        Split articles into batches that fit the prompt token budget.
+
+        Articles are packed greedily in order until the next one would push
+        the estimated prompt past max_input_tokens, or the batch holds
+        batch_size articles (which bounds the size of the JSON reply).
+        """
+        budget = self.max_input_tokens - self._estimate_tokens(self.build_batch_prompt([]))
+        batches = []
+        batch, used = [], 0
+        for article in articles:
+            # Title, truncated description and the per-article JSON keys
+            cost = self._estimate_tokens(
+                f"{article.title}{(article.description or '')[:DESCRIPTION_PROMPT_CHARS]}"
+            ) + 10
+            if batch and (used + cost > budget or len(batch) >= self.batch_size):
+                batches.append(batch)
+                batch, used = [], 0
+            batch.append(article)
+            used += cost
+        if batch:
+            batches.append(batch)
+        return batches
 
     def analyze_batch(self, articles: List[Article]) -> List[Dict[str, Any]]:
         """
@@ -65,20 +151,24 @@ class ArticleAnalyzer:
         """
         if not articles:
             return []
+        return self._complete_analysis(self.build_batch_prompt(articles))
 
+    @staticmethod
+    def build_batch_prompt(articles: List[Article]) -> str:
+        """Build the analysis prompt for a batch of Article objects or column rows."""
         # Prepare article summaries for the prompt
         article_summaries = []
         for i, article in enumerate(articles):
             summary = {
                 "id": i,
                 "title": article.title,
-                "description": (article.description or "")[:500],  # Truncate for token efficiency
+                "description": (article.description or "")[:DESCRIPTION_PROMPT_CHARS],  # Truncate for token efficiency
             }
             article_summaries.append(summary)
 
         prompt = f"""Analyze these {len(articles)} news articles:
 
-{article_summaries}
+{orjson.dumps(article_summaries).decode()}
 
 For each article (identified by id), provide analysis in this JSON format:
 {{
@@ -93,9 +183,15 @@ For each article (identified by id), provide analysis in this JSON format:
         }}
     ]
 }}"""
+        return prompt
 
+    def _complete_analysis(self, prompt: str, client=None) -> List[Dict[str, Any]]:
+        """Send one batch prompt to the LLM (safe to call from worker threads)."""
+        client = client or self.client
         try:
-            result = self.client.complete_json(prompt, system=ANALYSIS_SYSTEM_PROMPT, max_tokens=2048)
+            result = client.complete_json(
+                prompt, system=ANALYSIS_SYSTEM_PROMPT, max_tokens=2048, schema=ANALYSIS_SCHEMA
+            )
             return result.get("analyses", [])
         except Exception as e:
             logger.error(f"Error analyzing batch: {e}")
@@ -118,10 +214,16 @@ For each article (identified by id), provide analysis in this JSON format:
             "skipped": 0,
         }
 
-        # Get pending articles
-        pending_articles = Article.query.filter(
-            Article.analysis_status == 'pending'
-        ).order_by(Article.fetched_at.desc()).limit(limit).all()
+        # Get pending articles as lightweight rows holding only the columns used here
+        pending_articles = db.session.execute(
+            select(
+                Article.id, Article.title, Article.description, Article.content,
+                Article.content_hash, Article.analyzed_at,
+            )
+            .where(Article.analysis_status == 'pending')
+            .order_by(Article.fetched_at.desc())
+            .limit(limit)
+        ).all()
 
         if not pending_articles:
             logger.info("No pending articles to analyze")
@@ -129,54 +231,71 @@ For each article (identified by id), provide analysis in this JSON format:
 
         logger.info(f"Found {len(pending_articles)} pending articles to analyze")
 
-        # Process in batches
-        for i in range(0, len(pending_articles), self.batch_size):
-            batch = pending_articles[i:i + self.batch_size]
-
-            # Mark as processing
+        # Work out what each batch needs (prompt, id, hash) up front;
+        # worker threads never touch the session
+        batches = []
+        for batch in self.pack_batches(pending_articles):
+            entries = []
             for article in batch:
-                article.analysis_status = 'processing'
-            db.session.commit()
-
-            # Analyze batch
-            results = self.analyze_batch(batch)
-
-            # Apply results
-            for j, article in enumerate(batch):
-                stats["processed"] += 1
-
-                # Check if content has changed
                 new_hash = self.compute_content_hash(article)
-                if article.content_hash == new_hash and article.analyzed_at:
-                    article.analysis_status = 'completed'
-                    stats["skipped"] += 1
-                    continue
-
-                # Find matching result
-                result = None
-                for r in results:
-                    if r.get("id") == j:
-                        result = r
-                        break
-
-                if result:
-                    article.llm_category = result.get("category")
-                    article.llm_sentiment = result.get("sentiment")
-                    article.llm_metadata = {
-                        "entities": result.get("entities", []),
-                        "topics": result.get("topics", []),
-                        "key_facts": result.get("key_facts", []),
-                    }
-                    article.content_hash = new_hash
-                    article.analyzed_at = datetime.utcnow()
-                    article.analysis_status = 'completed'
-                    stats["succeeded"] += 1
-                else:
-                    article.analysis_status = 'failed'
-                    stats["failed"] += 1
-
-            db.session.commit()
+                unchanged = article.content_hash == new_hash and article.analyzed_at is not None
+                entries.append((article.id, new_hash, unchanged))
+            batches.append((entries, self.build_batch_prompt(batch)))
+
+        # Resolve the client before claiming rows: a missing SDK or unknown provider
+        # then leaves the articles pending, and worker threads don't race to create it
+        client = self.client
+
+        # Mark the whole run as processing with one UPDATE and one commit
+        db.session.query(Article).filter(
+            Article.id.in_([article.id for article in pending_articles])
+        ).update({'analysis_status': 'processing'}, synchronize_session=False)
+        db.session.commit()
 
+        # Keep several LLM calls in flight; apply results in batch order on this thread
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+            futures = [pool.submit(self._complete_analysis, prompt, client) for _, prompt in batches]
+
+            for (entries, _), future in zip(batches, futures):
+                results = future.result()
+                # Index results by batch position; reversed so the first duplicate wins
+                by_id = {r.get("id"): r for r in reversed(results) if isinstance(r, dict)}
+
+                # Collect results as plain mappings and write them in one bulk UPDATE
+                updates = []
+                for j, (article_id, new_hash, unchanged) in enumerate(entries):
+                    stats["processed"] += 1
+
+                    # Check if content has changed
+                    if unchanged:
+                        updates.append({"id": article_id, "analysis_status": 'completed'})
+                        stats["skipped"] += 1
+                        continue
+
+                    result = by_id.get(j)
+                    if result:
+                        updates.append({
+                            "id": article_id,
+                            "llm_category": result.get("category"),
+                            "llm_sentiment": result.get("sentiment"),
+                            "llm_metadata": {
+                                "entities": result.get("entities", []),
+                                "topics": result.get("topics", []),
+                                "key_facts": result.get("key_facts", []),
+                            },
+                            "content_hash": new_hash,
+                            "analyzed_at": datetime.utcnow(),
+                            "analysis_status": 'completed',
+                        })
+                        stats["succeeded"] += 1
+                    else:
+                        updates.append({"id": article_id, "analysis_status": 'failed'})
+                        stats["failed"] += 1
+
+                db.session.bulk_update_mappings(Article, updates)
+                db.session.commit()
+
+        invalidate_cache()
         logger.info(f"Analysis complete: {stats}")
         return stats
 
@@ -187,38 +306,61 @@ For each article (identified by id), provide analysis in this JSON format:
         Returns:
             Number of articles marked for reanalysis
         """
-        count = 0
-        articles = Article.query.filter(
-            Article.analysis_status == 'completed'
-        ).all()
-
-        for article in articles:
-            new_hash = self.compute_content_hash(article)
-            if article.content_hash != new_hash:
-                article.analysis_status = 'pending'
-                count += 1
+        if db.engine.dialect.name == 'postgresql':
+            # Hash in the database (built-in sha256, PG 11+) so no article bodies leave it
+            sql_hash = func.encode(func.sha256(func.convert_to(
+                Article.title + '|' + func.coalesce(Article.description, '') + '|' +
+                func.coalesce(Article.content, ''),
+                text("'UTF8'")
+            )), text("'hex'"))
+            count = db.session.query(Article).filter(
+                Article.analysis_status == 'completed',
+                Article.content_hash.is_distinct_from(sql_hash)
+            ).update({'analysis_status': 'pending'}, synchronize_session=False)
+            db.session.commit()
+            logger.info(f"Marked {count} articles for reanalysis")
+            return count
 
+        # Elsewhere hash bare column rows, streamed in pages to bound memory
+        rows = db.session.query(
+            Article.id, Article.title, Article.description, Article.content, Article.content_hash
+        ).filter(
+            Article.analysis_status == 'completed'
+        ).yield_per(REHASH_PAGE_SIZE)
+
+        changed_ids = [
+            row.id for row in rows
+            if row.content_hash != content_hash(row.title, row.description, row.content)
+        ]
+        count = len(changed_ids)
+
+        for i in range(0, count, REHASH_PAGE_SIZE):
+            db.session.query(Article).filter(
+                Article.id.in_(changed_ids[i:i + REHASH_PAGE_SIZE])
+            ).update({'analysis_status': 'pending'}, synchronize_session=False)
         db.session.commit()
         logger.info(f"Marked {count} articles for reanalysis")
         return count
 
     def get_analysis_stats(self) -> Dict[str, Any]:
         """Get statistics about article analysis status."""
-        from sqlalchemy import func
-
-        status_counts = db.session.query(
-            Article.analysis_status,
-            func.count(Article.id)
-        ).group_by(Article.analysis_status).all()
-
-        category_counts = db.session.query(
-            Article.llm_category,
-            func.count(Article.id)
-        ).filter(
-            Article.llm_category.isnot(None)
-        ).group_by(Article.llm_category).all()
+        # Both breakdowns in one round-trip, tagged by which one each row belongs to
+        by_status = select(
+            literal('status').label('kind'),
+            Article.analysis_status.label('key'),
+            func.count(Article.id),
+        ).group_by(Article.analysis_status)
+        by_category = select(
+            literal('category').label('kind'),
+            Article.llm_category.label('key'),
+            func.count(Article.id),
+        ).where(Article.llm_category.isnot(None)).group_by(Article.llm_category)
+
+        status_counts, category_counts = {}, {}
+        for kind, key, count in db.session.execute(union_all(by_status, by_category)):
+            (status_counts if kind == 'status' else category_counts)[key] = count
 
         return {
-            "by_status": {status: count for status, count in status_counts},
-            "by_category": {cat: count for cat, count in category_counts},
+            "by_status": status_counts,
+            "by_category": category_counts,
         }
@@ -1,10 +1,19 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Tuple
+from sqlalchemy import insert
 from app import db
+from app.cache import invalidate_cache
 from app.models import Feed, Article
+from app.models.feed import adjust_article_count
 from app.services.rss_parser import RSSParser
 
 
+# Max feeds downloaded concurrently by fetch_all_active
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', 16))
+
+
 class FeedFetcher:
     """Service for fetching and storing RSS feed articles."""
 
@@ -13,16 +22,41 @@ class FeedFetcher:
         """
         Fetch articles from a single feed.
 
+        Returns tuple of (new_count, updated_count).
+        """
+        return FeedFetcher.store_entries(
+            feed, RSSParser.parse(feed.url, etag=feed.etag, modified=feed.last_modified)
+        )
+
+    @staticmethod
+    def store_entries(feed: Feed, parsed: dict) -> Tuple[int, int]:
+        """
+        Store the entries of an already parsed feed.
+
         Returns tuple of (new_count, updated_count).
         """
         new_count = 0
         updated_count = 0
 
         try:
-            parsed = RSSParser.parse(feed.url)
+            # Keep the HTTP validators for the next conditional GET
+            feed.etag = parsed.get('etag')
+            feed.last_modified = parsed.get('last_modified')
+
+            # Look up every already-stored guid of this document in one query
+            guids = {entry_data['guid'] for entry_data in parsed['entries']}
+            existing_by_guid = {
+                article.guid: article
+                for article in Article.query.filter(Article.guid.in_(guids))
+            } if guids else {}
+
+            # New articles as plain rows, inserted with one multi-row INSERT below
+            new_rows = {}
 
             for entry_data in parsed['entries']:
-                existing = Article.query.filter_by(guid=entry_data['guid']).first()
+                existing = existing_by_guid.get(entry_data['guid'])
+                # Repeated guids later in the same document match the pending row
+                pending = new_rows.get(entry_data['guid'])
 
                 if existing:
                     # Update if content changed
@@ -31,25 +65,39 @@ class FeedFetcher:
                         existing.description = entry_data['description']
                         existing.content = entry_data['content']
                         updated_count += 1
+                elif pending:
+                    if pending['title'] != entry_data['title']:
+                        pending.update(
+                            title=entry_data['title'],
+                            description=entry_data['description'],
+                            content=entry_data['content'],
+                        )
+                        updated_count += 1
                 else:
-                    # Create new article
-                    article = Article(
-                        feed_id=feed.id,
-                        guid=entry_data['guid'],
-                        title=entry_data['title'],
-                        link=entry_data['link'],
-                        description=entry_data['description'],
-                        content=entry_data['content'],
-                        author=entry_data['author'],
-                        thumbnail=entry_data.get('thumbnail', ''),
-                        published_at=entry_data['published_at'],
-                    )
-                    db.session.add(article)
+                    new_rows[entry_data['guid']] = {
+                        'feed_id': feed.id,
+                        'guid': entry_data['guid'],
+                        'title': entry_data['title'],
+                        'link': entry_data['link'],
+                        'description': entry_data['description'],
+                        'content': entry_data['content'],
+                        'author': entry_data['author'],
+                        'thumbnail': entry_data.get('thumbnail', ''),
+                        'published_at': entry_data['published_at'],
+                    }
                     new_count += 1
 
+            if new_rows:
+                db.session.execute(insert(Article), list(new_rows.values()))
+                # Bulk inserts bypass the ORM flush hook that maintains article_count
+                adjust_article_count(db.session, feed.id, len(new_rows))
+
             feed.last_fetched = datetime.utcnow()
             db.session.commit()
 
+            if new_count or updated_count:
+                invalidate_cache()
+
         except Exception as e:
             db.session.rollback()
             raise e
@@ -71,23 +119,32 @@ class FeedFetcher:
         }
 
         feeds = Feed.query.filter_by(is_active=True).all()
+        if not feeds:
+            return results
+
+        # Downloads overlap on worker threads; DB writes stay on this thread's session
+        with ThreadPoolExecutor(max_workers=min(FETCH_CONCURRENCY, len(feeds))) as pool:
+            downloads = [
+                pool.submit(RSSParser.parse, feed.url, etag=feed.etag, modified=feed.last_modified)
+                for feed in feeds
+            ]
 
-        for feed in feeds:
-            try:
-                new_count, updated_count = FeedFetcher.fetch_feed(feed)
-                results['feeds'].append({
-                    'id': feed.id,
-                    'name': feed.name,
-                    'new': new_count,
-                    'updated': updated_count
-                })
-                results['total_new'] += new_count
-                results['total_updated'] += updated_count
-            except Exception as e:
-                results['errors'].append({
-                    'feed_id': feed.id,
-                    'feed_name': feed.name,
-                    'error': str(e)
-                })
+            for feed, download in zip(feeds, downloads):
+                try:
+                    new_count, updated_count = FeedFetcher.store_entries(feed, download.result())
+                    results['feeds'].append({
+                        'id': feed.id,
+                        'name': feed.name,
+                        'new': new_count,
+                        'updated': updated_count
+                    })
+                    results['total_new'] += new_count
+                    results['total_updated'] += updated_count
+                except Exception as e:
+                    results['errors'].append({
+                        'feed_id': feed.id,
+                        'feed_name': feed.name,
+                        'error': str(e)
+                    })
 
         return results
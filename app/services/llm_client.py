@@ -1,12 +1,27 @@
 """LLM Client abstraction for multiple providers."""
 import os
-import json
+import re
+import orjson
 import logging
+import threading
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from typing import Optional, Dict, Any, List
 
 logger = logging.getLogger(__name__)
 
+# Tool the Anthropic client forces a call to when a reply schema is given
+JSON_TOOL_NAME = "respond"
+
+# Markdown code fence around a JSON reply, e.g. ```json {...} ```
+_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)```', re.DOTALL)
+
+
+def _strip_fences(text: str) -> str:
+    """Return the body of the first markdown code fence, or the text unchanged."""
+    match = _FENCE_RE.search(text)
+    return match.group(1).strip() if match else text
+
 
 class BaseLLMClient(ABC):
     """Abstract base class for LLM clients."""
@@ -17,8 +32,19 @@ class BaseLLMClient(ABC):
         pass
 
     @abstractmethod
-    def complete_json(self, prompt: str, system: Optional[str] = None, max_tokens: int = 1024) -> Dict[str, Any]:
-        """Generate a JSON completion and parse it."""
+    def complete_json(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Generate a JSON completion and parse it.
+
+        ``schema`` is an optional JSON Schema for the reply object; providers
+        with native structured output use it to constrain generation.
+        """
         pass
 
 
@@ -48,8 +74,17 @@ class AnthropicClient(BaseLLMClient):
         response = self.client.messages.create(**kwargs)
         return response.content[0].text
 
-    def complete_json(self, prompt: str, system: Optional[str] = None, max_tokens: int = 1024) -> Dict[str, Any]:
+    def complete_json(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         """Generate a JSON completion and parse it."""
+        if schema is not None:
+            return self._complete_tool(prompt, system, max_tokens, schema)
+
         # Add JSON instruction to system prompt
         json_system = (system or "") + "\n\nYou must respond with valid JSON only. No other text."
 
@@ -58,21 +93,39 @@ class AnthropicClient(BaseLLMClient):
         # Try to extract JSON from the response
         try:
             # Handle case where response might have markdown code blocks
-            if "```json" in response_text:
-                start = response_text.find("```json") + 7
-                end = response_text.find("```", start)
-                response_text = response_text[start:end].strip()
-            elif "```" in response_text:
-                start = response_text.find("```") + 3
-                end = response_text.find("```", start)
-                response_text = response_text[start:end].strip()
-
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
+            response_text = _strip_fences(response_text)
+
+            return orjson.loads(response_text)
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON response: {e}")
             logger.debug(f"Response text: {response_text}")
             return {}
 
+    def _complete_tool(
+        self, prompt: str, system: Optional[str], max_tokens: int, schema: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Force a single tool call whose input is the reply, so no JSON text is parsed."""
+        kwargs = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+            "tools": [{
+                "name": JSON_TOOL_NAME,
+                "description": "Return the requested result.",
+                "input_schema": schema,
+            }],
+            "tool_choice": {"type": "tool", "name": JSON_TOOL_NAME},
+        }
+        if system:
+            kwargs["system"] = system
+
+        response = self.client.messages.create(**kwargs)
+        for block in response.content:
+            if block.type == "tool_use":
+                return block.input
+        logger.error("Structured response had no tool_use block")
+        return {}
+
 
 class OpenAIClient(BaseLLMClient):
     """OpenAI API client as fallback."""
@@ -99,8 +152,14 @@ class OpenAIClient(BaseLLMClient):
         )
         return response.choices[0].message.content
 
-    def complete_json(self, prompt: str, system: Optional[str] = None, max_tokens: int = 1024) -> Dict[str, Any]:
-        """Generate a JSON completion and parse it."""
+    def complete_json(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Generate a JSON completion and parse it (JSON mode; schema is described by the prompt)."""
         json_system = (system or "") + "\n\nYou must respond with valid JSON only. No other text."
 
         messages = []
@@ -118,8 +177,8 @@ class OpenAIClient(BaseLLMClient):
         response_text = response.choices[0].message.content
 
         try:
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
+            return orjson.loads(response_text)
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON response: {e}")
             return {}
 
@@ -135,8 +194,8 @@ class GeminiClient(BaseLLMClient):
         except ImportError:
             raise ImportError("google-genai package not installed. Run: pip install google-genai")
 
-    def complete(self, prompt: str, system: Optional[str] = None, max_tokens: int = 1024) -> str:
-        """Generate a text completion using Gemini."""
+    def complete(self, prompt: str, system: Optional[str] = None, max_tokens: int = 1024, **config) -> str:
+        """Generate a text completion using Gemini (extra config goes to GenerateContentConfig)."""
         from google.genai import types
 
         full_prompt = prompt
@@ -148,29 +207,31 @@ class GeminiClient(BaseLLMClient):
             contents=full_prompt,
             config=types.GenerateContentConfig(
                 max_output_tokens=max_tokens,
+                **config,
             )
         )
         return response.text
 
-    def complete_json(self, prompt: str, system: Optional[str] = None, max_tokens: int = 1024) -> Dict[str, Any]:
-        """Generate a JSON completion and parse it."""
-        json_system = (system or "") + "\n\nYou must respond with valid JSON only. No other text."
+    def complete_json(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Generate a JSON completion in Gemini's native JSON mode and parse it."""
+        config = {"response_mime_type": "application/json"}
+        if schema is not None:
+            config["response_schema"] = schema
 
-        response_text = self.complete(prompt, system=json_system, max_tokens=max_tokens)
+        response_text = self.complete(prompt, system=system, max_tokens=max_tokens, **config)
 
         try:
-            # Handle case where response might have markdown code blocks
-            if "```json" in response_text:
-                start = response_text.find("```json") + 7
-                end = response_text.find("```", start)
-                response_text = response_text[start:end].strip()
-            elif "```" in response_text:
-                start = response_text.find("```") + 3
-                end = response_text.find("```", start)
-                response_text = response_text[start:end].strip()
-
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
+            # JSON mode shouldn't fence its output, but older models occasionally do
+            response_text = _strip_fences(response_text)
+
+            return orjson.loads(response_text)
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON response: {e}")
             logger.debug(f"Response text: {response_text}")
             return {}
@@ -179,12 +240,15 @@ class GeminiClient(BaseLLMClient):
 class LLMClientFactory:
     """Factory for creating LLM clients based on configuration."""
 
-    _instance: Optional[BaseLLMClient] = None
+    # One shared client per provider, so SDK connection pools are reused across requests
+    _instances: Dict[str, BaseLLMClient] = {}
+    # Guards _instances so concurrent callers build each client only once
+    _lock = threading.Lock()
 
     @classmethod
     def create(cls, provider: Optional[str] = None, force_new: bool = False) -> BaseLLMClient:
         """
-        Create or return cached LLM client.
+        Create or return the cached LLM client for a provider.
 
         Args:
             provider: 'anthropic', 'openai', 'google', or 'gemini'. If None, reads from LLM_PROVIDER env var.
@@ -193,10 +257,22 @@ class LLMClientFactory:
         Returns:
             BaseLLMClient instance
         """
-        if cls._instance is not None and not force_new:
-            return cls._instance
-
         provider = provider or os.getenv('LLM_PROVIDER', 'anthropic')
+        if not force_new and provider in cls._instances:
+            return cls._instances[provider]
+
+        with cls._lock:
+            # Another thread may have built it while we waited for the lock
+            if not force_new and provider in cls._instances:
+                return cls._instances[provider]
+
+            client = cls._build_client(provider)
+            cls._instances[provider] = client
+            return client
+
+    @staticmethod
+    def _build_client(provider: str) -> BaseLLMClient:
+        """Construct a new client for a provider from environment settings."""
         model = os.getenv('LLM_MODEL')
 
         if provider == 'anthropic':
@@ -226,22 +302,37 @@ class LLMClientFactory:
         else:
             raise ValueError(f"Unknown LLM provider: {provider}")
 
-        cls._instance = client
         return client
 
     @classmethod
     def is_available(cls) -> bool:
         """Check if LLM is configured and available."""
-        if not os.getenv('LLM_ENABLED', 'false').lower() == 'true':
-            return False
+        return _availability(
+            os.getenv('LLM_ENABLED', 'false'),
+            os.getenv('LLM_PROVIDER', 'anthropic'),
+            os.getenv('ANTHROPIC_API_KEY'),
+            os.getenv('OPENAI_API_KEY'),
+            os.getenv('GOOGLE_API_KEY'),
+        )
 
-        provider = os.getenv('LLM_PROVIDER', 'anthropic')
-
-        if provider == 'anthropic':
-            return bool(os.getenv('ANTHROPIC_API_KEY'))
-        elif provider == 'openai':
-            return bool(os.getenv('OPENAI_API_KEY'))
-        elif provider in ('google', 'gemini'):
-            return bool(os.getenv('GOOGLE_API_KEY'))
 
+@lru_cache(maxsize=1)
+def _availability(
+    enabled: str,
+    provider: str,
+    anthropic_key: Optional[str],
+    openai_key: Optional[str],
+    google_key: Optional[str],
+) -> bool:
+    """Availability for one combination of settings; memoized since env vars rarely change."""
+    if not enabled.lower() == 'true':
         return False
+
+    if provider == 'anthropic':
+        return bool(anthropic_key)
+    elif provider == 'openai':
+        return bool(openai_key)
+    elif provider in ('google', 'gemini'):
+        return bool(google_key)
+
+    return False
@@ -1,35 +1,133 @@
+import codecs
 import feedparser
 import re
+import requests
+import xml.etree.ElementTree as ElementTree
+from email.utils import parsedate_to_datetime
 from html import unescape
-from datetime import datetime
+from datetime import datetime, timezone
 from time import mktime
 from typing import Optional
 
+try:
+    from feedparser.sanitizer import _sanitize_html
+    from feedparser.datetimes import _parse_date
+    from feedparser.urls import _urljoin, make_safe_absolute_uri, resolve_relative_uris
+except ImportError:  # pragma: no cover - feedparser moved its helpers
+    _sanitize_html = _parse_date = _urljoin = make_safe_absolute_uri = resolve_relative_uris = None
+
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WS_RE = re.compile(r'\s+')
+_IMG_RE = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
+_CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+_XML_ENCODING_RE = re.compile(rb'^\s*<\?xml[^>]*\sencoding=["\']([\w.:-]+)')
+
+# Namespaced RSS extension elements read by the fast parser
+_CONTENT_ENCODED = '{http://purl.org/rss/1.0/modules/content/}encoded'
+_DC_CREATOR = '{http://purl.org/dc/elements/1.1/}creator'
+# Elements feedparser reads as published_parsed / updated_parsed, besides <pubDate>
+_PUBLISHED_TAGS = (
+    '{http://purl.org/dc/terms/}issued',
+    '{http://www.w3.org/2005/Atom}published',
+)
+_UPDATED_TAGS = (
+    '{http://purl.org/dc/elements/1.1/}date',
+    '{http://purl.org/dc/terms/}modified',
+    '{http://www.w3.org/2005/Atom}updated',
+)
+_MEDIA_THUMBNAIL = '{http://search.yahoo.com/mrss/}thumbnail'
+_MEDIA_CONTENT = '{http://search.yahoo.com/mrss/}content'
+
+
+def _is_image(mime_type: str) -> bool:
+    """True for image/* MIME types (empty or missing types are not images)."""
+    return mime_type.startswith('image') if mime_type else False
+
 
 def strip_html(text: str) -> str:
     """Remove HTML tags and decode entities from text."""
     if not text:
         return ""
-    # Remove HTML tags
-    text = re.sub(r'<[^>]+>', ' ', text)
-    # Decode HTML entities
-    text = unescape(text)
-    # Clean up whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    # Remove HTML tags, decode entities, then clean up whitespace
+    return _WS_RE.sub(' ', unescape(_TAG_RE.sub(' ', text))).strip()
+
+
+# Seconds to wait for a feed server before giving up on it
+FETCH_TIMEOUT = 10
+USER_AGENT = 'NewsAPI-Backend/1.0 (+https://github.com/realnihal/newsapi-backend)'
 
 
 class RSSParser:
     """Parse RSS/Atom feeds and extract article data."""
 
     @staticmethod
-    def parse(url: str) -> dict:
+    def parse(url: str, etag: Optional[str] = None, modified: Optional[str] = None) -> dict:
+        """
+        Download and parse an RSS/Atom feed from URL.
+
+        Pass the etag/modified validators from the previous fetch to make a
+        conditional GET; an unchanged feed returns no entries and
+        not_modified=True without being parsed.
+
+        Returns dict with feed info, list of entries and the new validators.
+        """
+        body, etag, modified, headers = RSSParser.download(url, etag=etag, modified=modified)
+        if body is None:
+            return {'feed': None, 'entries': [], 'not_modified': True, 'etag': etag, 'last_modified': modified}
+
+        parsed = RSSParser.parse_bytes(body, response_headers=headers)
+        parsed.update(not_modified=False, etag=etag, last_modified=modified)
+        return parsed
+
+    @staticmethod
+    def download(url: str, etag: Optional[str] = None, modified: Optional[str] = None) -> tuple:
         """
-        Parse an RSS/Atom feed from URL.
+        Fetch the raw feed document over HTTP.
+
+        Returns (body, etag, last_modified, headers); body is None on 304 Not
+        Modified. headers are the lowercased response headers plus the final
+        URL as content-location, the base feedparser resolves relative links
+        against.
+        """
+        headers = {'User-Agent': USER_AGENT}
+        if etag:
+            headers['If-None-Match'] = etag
+        if modified:
+            headers['If-Modified-Since'] = modified
+
+        try:
+            response = requests.get(url, timeout=FETCH_TIMEOUT, headers=headers)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise ValueError(f"Failed to fetch feed: {e}")
+
+        new_etag = response.headers.get('ETag', etag)
+        new_modified = response.headers.get('Last-Modified', modified)
+        if response.status_code == 304:
+            return None, new_etag, new_modified, None
+        # A Content-Location sent by the server still takes precedence over the URL
+        response_headers = {'content-location': response.url}
+        response_headers.update((name.lower(), value) for name, value in response.headers.items())
+        return response.content, new_etag, new_modified, response_headers
+
+    @staticmethod
+    def parse_bytes(body: bytes, response_headers: Optional[dict] = None) -> dict:
+        """
+        Parse an already downloaded RSS/Atom document.
+
+        Plain RSS 2.0 documents go through a C-accelerated ElementTree fast
+        path; anything else (Atom, RSS 1.0, malformed XML) uses feedparser.
+        response_headers (as returned by download) supply the charset and the
+        content-location relative links are resolved against.
 
         Returns dict with feed info and list of entries.
         """
-        feed = feedparser.parse(url)
+        parsed = RSSParser._parse_rss2(body, response_headers)
+        if parsed is not None:
+            return parsed
+
+        feed = feedparser.parse(body, response_headers=response_headers)
 
         if feed.bozo and not feed.entries:
             raise ValueError(f"Failed to parse feed: {feed.bozo_exception}")
@@ -39,6 +137,155 @@ class RSSParser:
             'entries': [RSSParser._extract_entry(e) for e in feed.entries]
         }
 
+    @staticmethod
+    def _parse_rss2(body: bytes, response_headers: Optional[dict] = None) -> Optional[dict]:
+        """
+        Parse a well-formed RSS 2.0 document with ElementTree.
+
+        Produces the same fields as the feedparser path, including relative
+        URL resolution and HTML sanitizing of descriptions and content.
+        Returns None when the document is not plain RSS 2.0 so the caller
+        can fall back.
+        """
+        if _sanitize_html is None or _parse_date is None:
+            return None
+        headers = response_headers or {}
+
+        # feedparser tracks per-element xml:base, and prefers an HTTP charset
+        # over the document's own declaration; leave those documents to it
+        if b'xml:base' in body:
+            return None
+        charset = _CHARSET_RE.search(headers.get('content-type', ''))
+        if charset:
+            declared = _XML_ENCODING_RE.match(body)
+            declared = declared.group(1).decode() if declared else 'utf-8'
+            try:
+                if codecs.lookup(charset.group(1)).name != codecs.lookup(declared).name:
+                    return None
+            except LookupError:
+                return None
+        base = make_safe_absolute_uri(headers.get('content-location', ''))
+
+        try:
+            root = ElementTree.fromstring(body)
+        except ElementTree.ParseError:
+            return None
+
+        channel = root.find('channel')
+        if root.tag != 'rss' or channel is None:
+            return None
+
+        try:
+            entries = [RSSParser._extract_rss2_item(item, base) for item in channel.iter('item')]
+        except (TypeError, ValueError, OverflowError):
+            # Unusual dates or markup; let feedparser's lenient handling take it
+            return None
+
+        link = (channel.findtext('link') or '').strip()
+        return {
+            'feed': {
+                'title': channel.findtext('title') or 'Untitled Feed',
+                'description': channel.findtext('description') or '',
+                'link': _urljoin(base, link) if link else '',
+                'language': channel.findtext('language') or '',
+            },
+            'entries': entries,
+        }
+
+    @staticmethod
+    def _extract_rss2_item(item, base: str = '') -> dict:
+        """Extract article data from an RSS 2.0 <item> element, resolving URLs against base."""
+        def text(tag):
+            value = item.findtext(tag)
+            return value.strip() if value else ''
+
+        title = text('title')
+        link = _urljoin(base, text('link')) if text('link') else ''
+        guid_element = item.find('guid')
+        guid_text = text('guid')
+        # Like feedparser, a permalink guid is a URL and stands in for a missing <link>
+        if guid_text and guid_element.get('isPermaLink', 'true') != 'false':
+            guid_text = _urljoin(base, guid_text)
+            link = link or guid_text
+        guid = guid_text or link or title
+
+        # feedparser reports dates as UTC struct_time; mirror its conversion
+        published = None
+        pub_date = text('pubDate')
+        if pub_date:
+            parsed_date = parsedate_to_datetime(pub_date)
+            if parsed_date.tzinfo is not None:
+                parsed_date = parsed_date.astimezone(timezone.utc)
+            published = datetime.fromtimestamp(mktime(parsed_date.timetuple()))
+        else:
+            # Like _extract_entry: a published date first, then an updated one
+            for tag in _PUBLISHED_TAGS + _UPDATED_TAGS:
+                parsed_time = _parse_date(text(tag)) if text(tag) else None
+                if parsed_time:
+                    published = datetime.fromtimestamp(mktime(parsed_time))
+                    break
+
+        encoded = text(_CONTENT_ENCODED)
+        description = text('description')
+        if description:
+            summary = RSSParser._sanitize(description, base)
+            content = RSSParser._sanitize(encoded, base) if encoded else summary
+        else:
+            # feedparser fills a missing summary from the content
+            content = summary = RSSParser._sanitize(encoded, base)
+
+        return {
+            'guid': guid,
+            'title': strip_html(title or 'Untitled'),
+            'link': link,
+            'description': strip_html(summary)[:1000],
+            'content': content,
+            'author': text('author') or text(_DC_CREATOR),
+            'published_at': published,
+            'thumbnail': RSSParser._extract_rss2_thumbnail(item, content),
+        }
+
+    @staticmethod
+    def _sanitize(html: str, base: str = '') -> str:
+        """Resolve and sanitize feed HTML the way feedparser does; plain text passes through."""
+        if '<' not in html:
+            return html
+        if base:
+            html = resolve_relative_uris(html, base, 'utf-8', 'text/html')
+        return _sanitize_html(html, 'utf-8', 'text/html')
+
+    @staticmethod
+    def _extract_rss2_thumbnail(item, content: str) -> str:
+        """Extract thumbnail image from an RSS 2.0 item (same precedence as _extract_thumbnail)."""
+        thumbnail = ''
+        media_thumbnail = item.find(_MEDIA_THUMBNAIL)
+        media_content = item.findall(_MEDIA_CONTENT)
+
+        if media_thumbnail is not None:
+            thumbnail = media_thumbnail.get('url', '')
+        elif media_content:
+            for media in media_content:
+                if media.get('medium') == 'image' or _is_image(media.get('type')):
+                    thumbnail = media.get('url', '')
+                    break
+            else:
+                thumbnail = media_content[0].get('url', '')
+        else:
+            for enc in item.iter('enclosure'):
+                if _is_image(enc.get('type')):
+                    thumbnail = enc.get('url', '')
+                    break
+            else:
+                if content and '<' in content:
+                    img_match = _IMG_RE.search(content)
+                    if img_match:
+                        thumbnail = img_match.group(1)
+
+        # Validate thumbnail URL
+        if thumbnail and not thumbnail.startswith(('http://', 'https://')):
+            thumbnail = ''
+        return thumbnail
+
     @staticmethod
     def _extract_feed_info(feed) -> dict:
         """Extract feed metadata."""
@@ -59,7 +306,7 @@ class RSSParser:
         # Try media:content
         if hasattr(entry, 'media_content') and entry.media_content:
             for media in entry.media_content:
-                if media.get('medium') == 'image' or media.get('type', '').startswith('image'):
+                if media.get('medium') == 'image' or _is_image(media.get('type')):
                     return media.get('url', '')
             # If no image type specified, try first media
             if entry.media_content[0].get('url'):
@@ -68,7 +315,7 @@ class RSSParser:
         # Try enclosure
         if hasattr(entry, 'enclosures') and entry.enclosures:
             for enc in entry.enclosures:
-                if enc.get('type', '').startswith('image'):
+                if _is_image(enc.get('type')):
                     return enc.get('href', '') or enc.get('url', '')
 
         # Try to extract from content/description HTML
@@ -78,16 +325,16 @@ class RSSParser:
         elif hasattr(entry, 'summary'):
             content = entry.summary or ''
 
-        if content:
-            # Look for img tags
-            img_match = re.search(r'<img[^>]+src=["\']([^"\']+)["\']', content, re.IGNORECASE)
+        # Look for img tags; plain-text content (no '<' at all) skips the regex
+        if content and '<' in content:
+            img_match = _IMG_RE.search(content)
             if img_match:
                 return img_match.group(1)
 
         # Try links with image type
         if hasattr(entry, 'links'):
             for link in entry.links:
-                if link.get('type', '').startswith('image'):
+                if _is_image(link.get('type')):
                     return link.get('href', '')
 
         return ''
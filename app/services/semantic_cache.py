@@ -0,0 +1,78 @@
+"""Near-duplicate cache for LLM topic responses."""
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+
+# Minimum cosine similarity between term vectors for a cache hit
+SIMILARITY_THRESHOLD = float(os.getenv('LLM_CACHE_SIMILARITY', 0.86))
+
+# Seconds a cached response stays valid
+CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', 6 * 3600))
+
+# Entries kept per cache; the oldest are evicted first
+MAX_ENTRIES = 512
+
+
+def term_vector(terms: Iterable[str]) -> Dict[str, float]:
+    """L2-normalized term-frequency vector of a token list."""
+    counts = Counter(terms)
+    norm = math.sqrt(sum(c * c for c in counts.values()))
+    return {term: c / norm for term, c in counts.items()} if norm else {}
+
+
+class SemanticCache:
+    """
+    Thread-safe cache that returns a stored response for similar inputs.
+
+    Keys are token lists (e.g. the tokenized titles of a topic's lead
+    articles); a lookup hits when the cosine similarity between its term
+    vector and a stored one reaches the threshold, so a cluster that gains
+    or loses an article still reuses its summary.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, ttl: float = CACHE_TTL,
+                 max_entries: int = MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = []  # (expires_at, vector, value), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, terms: Iterable[str]) -> Optional[Any]:
+        """Return the value stored for the most similar input, or None."""
+        vector = term_vector(terms)
+        if not vector:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            self._entries = [entry for entry in self._entries if entry[0] > now]
+            best_value, best_similarity = None, self.threshold
+            for _, stored, value in self._entries:
+                # Sparse dot product over the smaller vector
+                small, large = (vector, stored) if len(vector) <= len(stored) else (stored, vector)
+                similarity = sum(w * large.get(term, 0.0) for term, w in small.items())
+                if similarity >= best_similarity:
+                    best_value, best_similarity = value, similarity
+            return best_value
+
+    def set(self, terms: Iterable[str], value: Any) -> None:
+        """Store a value for an input."""
+        vector = term_vector(terms)
+        if not vector:
+            return
+        with self._lock:
+            self._entries.append((time.monotonic() + self.ttl, vector, value))
+            del self._entries[:-self.max_entries]
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide cache, shared by scheduler runs in the same worker
+title_cache = SemanticCache()
@@ -1,16 +1,21 @@
 """Semantic grouper service for LLM-powered topic clustering."""
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import select
 from app import db
 from app.models.article import Article
 from app.models.topic import Topic, ArticleTopic
+from app.services.article_analyzer import LLM_CONCURRENCY, MAX_INPUT_TOKENS, ArticleAnalyzer
 from app.services.llm_client import LLMClientFactory
+from app.services.semantic_cache import title_cache
+from app.services.topic_analyzer import strip_html, topic_cache_key
 
 logger = logging.getLogger(__name__)
 
 GROUPING_SYSTEM_PROMPT = """You are a news analyst that groups related news articles into topics.
-Given a list of article titles and descriptions, identify groups of articles that cover the same story or event.
+Given a list of article titles, identify groups of articles that cover the same story or event.
 For each group, provide:
 1. A compelling topic title (not just copying an article title)
 2. The article IDs that belong to this group
@@ -19,19 +24,84 @@ For each group, provide:
 
 Only group articles that are clearly about the same specific story/event, not just the same general topic."""
 
-SUMMARY_SYSTEM_PROMPT = """You are a storyteller who makes news irresistible.
+GROUPING_PROMPT = """Analyze these {count} news articles and group related ones.
+Each line is id|category|title:
 
-Write summaries that:
-- Lead with the most surprising, interesting, or consequential fact
-- Use conversational, accessible language (not dry news-speak)
-- Create curiosity that makes readers want to click through
-- Are 2-3 sentences max
+{lines}
 
+Respond with one line per group and nothing else, in this format:
+title;category;importance;id1,id2,id3
+
+Example:
+Central Bank Surprises Markets With Rate Cut;Business;0.8;12,40,57
+
+Rules:
+- Only group articles that cover the SAME specific story/event
+- Each article can only belong to one group
+- Groups must have at least {min_group_size} articles
+- Importance: 0.9-1.0 for major breaking news, 0.7-0.8 for significant news, 0.5-0.6 for regular news, below 0.5 for minor news"""
+
+TITLES_SYSTEM_PROMPT = """You are a viral news editor writing headlines and summaries for several news clusters at once.
+
+For TITLES: hook readers with intrigue, be specific and concrete, use active verbs.
+AVOID generic news-speak like "Breaking:", "Update:", "announces", "reveals", "amid concerns".
+
+For SUMMARIES: lead with the most surprising or consequential fact, in conversational language, 2 sentences max.
 AVOID: Starting with "In a recent development..." or "According to reports..."
-GOOD: "A single AI chatbot just passed the bar exam in all 50 states—and it only took 4 hours."
-BAD: "Recent developments in AI technology have shown promising results in legal applications."
 
-Be accurate but engaging. Write like you're telling a friend about something wild you just read."""
+Be factual but compelling."""
+
+# Reply shape for providers with native structured output
+TITLES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "clusters": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "title": {"type": "string"},
+                    "summary": {"type": "string"},
+                },
+                "required": ["id", "title", "summary"],
+            },
+        },
+    },
+    "required": ["clusters"],
+}
+
+# Clusters sent per title/summary request; bounds the size of each JSON reply
+CLUSTERS_PER_PROMPT = 10
+
+
+def parse_group_lines(text: str) -> List[Dict[str, Any]]:
+    """
+    Parse 'title;category;importance;id1,id2' reply lines into group dicts.
+
+    Fields are split from the right so titles may contain semicolons;
+    malformed lines, fences and non-numeric ids are skipped.
+    """
+    groups = []
+    for line in (text or "").splitlines():
+        parts = line.strip().rsplit(";", 3)
+        if len(parts) != 4:
+            continue
+        title, category, importance, ids = (part.strip() for part in parts)
+        article_ids = [int(aid) for aid in ids.split(",") if aid.strip().isdigit()]
+        if not article_ids:
+            continue
+        try:
+            importance = float(importance)
+        except ValueError:
+            importance = 0.5
+        groups.append({
+            "title": title or "News Update",
+            "article_ids": article_ids,
+            "category": category or None,
+            "importance": importance,
+        })
+    return groups
 
 
 class SemanticGrouper:
@@ -57,58 +127,65 @@ class SemanticGrouper:
 
         Returns:
             List of topic groups with articles, title, category, and importance
+
+        Raises:
+            Exception: If the LLM call itself fails, so callers can tell an
+                unreachable model apart from a reply with no groups
         """
         since = datetime.utcnow() - timedelta(hours=hours)
 
-        # Get analyzed articles
-        articles = Article.query.filter(
-            Article.fetched_at >= since,
-            Article.analysis_status == 'completed'
-        ).order_by(Article.published_at.desc()).limit(200).all()
+        # Get analyzed articles as plain rows; full objects are loaded only for grouped ids
+        articles = db.session.execute(
+            select(Article.id, Article.title, Article.llm_category)
+            .where(Article.fetched_at >= since, Article.analysis_status == 'completed')
+            .order_by(Article.published_at.desc())
+            .limit(200)
+        ).all()
 
         if len(articles) < min_group_size:
             logger.info(f"Not enough analyzed articles to group: {len(articles)}")
             return []
 
-        # Prepare article data for grouping
-        article_data = []
-        for article in articles:
-            article_data.append({
-                "id": article.id,
-                "title": article.title,
-                "description": (article.description or "")[:300],
-                "category": article.llm_category,
-                "topics": article.llm_metadata.get("topics", []) if article.llm_metadata else [],
-            })
-
-        prompt = f"""Analyze these {len(articles)} news articles and group related ones:
-
-{article_data}
-
-Respond with JSON in this format:
-{{
-    "groups": [
-        {{
-            "title": "Descriptive Topic Title",
-            "article_ids": [1, 2, 3],
-            "category": "Politics",
-            "importance": 0.8
-        }}
-    ]
-}}
-
-Rules:
-- Only group articles that cover the SAME specific story/event
-- Each article can only belong to one group
-- Groups must have at least {min_group_size} articles
-- Importance: 0.9-1.0 for major breaking news, 0.7-0.8 for significant news, 0.5-0.6 for regular news, below 0.5 for minor news"""
+        # One terse line per article keeps the prompt (and the reply) small
+        lines = [
+            f"{article_id}|{category or ''}|{(title or '')[:120]}"
+            for article_id, title, category in articles
+        ]
+
+        # Keep the newest lines that fit the input budget so prefill time stays flat
+        budget = MAX_INPUT_TOKENS - ArticleAnalyzer._estimate_tokens(GROUPING_SYSTEM_PROMPT + GROUPING_PROMPT)
+        kept = 0
+        for line in lines:
+            budget -= ArticleAnalyzer._estimate_tokens(line) + 1
+            if budget < 0:
+                break
+            kept += 1
+        if kept < len(lines):
+            logger.info(f"Grouping prompt over budget, dropped {len(lines) - kept} oldest articles")
+            articles, lines = articles[:kept], lines[:kept]
+
+        prompt = GROUPING_PROMPT.format(
+            count=len(articles), lines="\n".join(lines), min_group_size=min_group_size
+        )
 
         try:
-            result = self.client.complete_json(prompt, system=GROUPING_SYSTEM_PROMPT, max_tokens=2048)
-            groups = result.get("groups", [])
+            response = self.client.complete(prompt, system=GROUPING_SYSTEM_PROMPT, max_tokens=2048)
+        except Exception as e:
+            logger.error(f"LLM grouping request failed: {e}")
+            raise
 
-            # Map article IDs back to Article objects
-            article_map = {a.id: a for a in articles}
+        try:
+            groups = parse_group_lines(response)
+
+            # Load Article objects only for the ids the LLM put in a group, in one query
+            known_ids = {row.id for row in articles}
+            grouped_ids = {
+                aid for group in groups for aid in group.get("article_ids", [])
+                if isinstance(aid, int) and aid in known_ids
+            }
+            article_map = {
+                a.id: a for a in Article.query.filter(Article.id.in_(grouped_ids))
+            } if grouped_ids else {}
             processed_groups = []
 
             for group in groups:
@@ -130,48 +207,125 @@ Rules:
             logger.error(f"Error grouping articles: {e}")
             return []
 
-    def generate_topic_summary(self, articles: List[Article], title: str) -> str:
-        """
-        Generate an AI summary for a topic from its articles.
-
-        Args:
-            articles: List of articles in the topic
-            title: Topic title for context
+    @staticmethod
+    def fallback_summary(articles: List[Article]) -> str:
+        """Extractive summary used when the LLM call fails."""
+        return articles[0].description[:500] if articles[0].description else articles[0].title
+
+    @staticmethod
+    def build_titles_prompt(clusters: List[List[Article]], titles: Optional[List[str]] = None) -> str:
+        """Build one prompt asking for a title and summary for each of several clusters."""
+        sections = []
+        for i, articles in enumerate(clusters):
+            lines = [f"### Cluster {i}"]
+            if titles and titles[i]:
+                lines.append(f"Topic: {titles[i]}")
+            for article in articles[:5]:
+                line = f"- {strip_html(article.title)}"
+                if article.description:
+                    line += f": {strip_html(article.description)[:150]}"
+                lines.append(line)
+            sections.append(chr(10).join(lines))
+
+        return f"""Write a title and summary for each of these {len(clusters)} news clusters.
+
+{(chr(10) * 2).join(sections)}
+
+For each cluster (identified by its number), give:
+- title: a catchy, specific headline (max 10 words); keep the Topic if one is given
+- summary: 2 sentences that lead with the most surprising or consequential fact
+
+Respond in JSON format:
+{{"clusters": [{{"id": 0, "title": "Your Catchy Title Here", "summary": "Lead with the hook. Follow with key details."}}]}}"""
+
+    def _complete_titles(self, prompt: str) -> Dict[int, Dict[str, Any]]:
+        """Send one multi-cluster prompt to the LLM (safe to call from worker threads)."""
+        try:
+            result = self.client.complete_json(
+                prompt, system=TITLES_SYSTEM_PROMPT, max_tokens=1500, schema=TITLES_SCHEMA
+            )
+            return {
+                item["id"]: item for item in result.get("clusters", [])
+                if isinstance(item, dict) and isinstance(item.get("id"), int)
+            }
+        except Exception as e:
+            logger.error(f"Error generating cluster titles: {e}")
+            return {}
 
-        Returns:
-            AI-generated summary string
+    def submit_titles_and_summaries(
+        self, pool: ThreadPoolExecutor, clusters: List[List[Article]], titles: Optional[List[str]] = None
+    ) -> Tuple[List[Optional[Tuple[str, Optional[str]]]], Dict[Future, List[int]]]:
         """
-        if not articles:
-            return ""
-
-        # Collect article content
-        article_texts = []
-        for article in articles[:5]:  # Use top 5 articles
-            text = f"- {article.title}"
-            if article.description:
-                text += f": {article.description[:200]}"
-            article_texts.append(text)
-
-        prompt = f"""Topic: {title}
+        Start the batched title/summary requests for clusters on pool.
 
-Articles:
-{chr(10).join(article_texts)}
+        Clusters go CLUSTERS_PER_PROMPT to a prompt and near-duplicates of
+        recently seen clusters come from the cache. Returns the per-cluster
+        results so far (cached pairs, else None) and a map from each pending
+        future to the cluster indices it answers; pass both to
+        collect_titles_and_summaries once the caller has done its own work.
+        """
+        results = [title_cache.get(key) if key else None for key in map(topic_cache_key, clusters)]
+        pending = [i for i, (articles, cached) in enumerate(zip(clusters, results)) if articles and cached is None]
+
+        # Build prompts on this thread; worker threads never touch the session
+        chunks = [pending[i:i + CLUSTERS_PER_PROMPT] for i in range(0, len(pending), CLUSTERS_PER_PROMPT)]
+        prompts = [
+            self.build_titles_prompt(
+                [clusters[i] for i in chunk], [titles[i] for i in chunk] if titles else None
+            )
+            for chunk in chunks
+        ]
+
+        if prompts:
+            # Resolve the client here so worker threads don't race to create it
+            self.client
+        futures = {pool.submit(self._complete_titles, prompt): chunk for chunk, prompt in zip(chunks, prompts)}
+        return results, futures
+
+    @staticmethod
+    def collect_titles_and_summaries(
+        clusters: List[List[Article]],
+        results: List[Optional[Tuple[str, Optional[str]]]],
+        futures: Dict[Future, List[int]],
+    ) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        Fill results from futures as they finish and cache the new answers.
 
-Write a 2-3 sentence summary that hooks readers immediately.
-Lead with the most surprising or consequential fact. Make it conversational and compelling—like you're telling a friend about something fascinating you just discovered."""
+        Returns (None, None) for clusters the LLM did not answer.
+        """
+        for future in as_completed(futures):
+            answer = future.result()
+            for local_id, i in enumerate(futures[future]):
+                item = answer.get(local_id)
+                if item and item.get("title"):
+                    results[i] = (item["title"], item.get("summary"))
+                    key = topic_cache_key(clusters[i])
+                    if key:
+                        title_cache.set(key, results[i])
+
+        return [result or (None, None) for result in results]
+
+    def generate_titles_and_summaries(
+        self, clusters: List[List[Article]], titles: Optional[List[str]] = None
+    ) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        Generate a (title, summary) pair per cluster with as few LLM calls as possible.
 
-        try:
-            summary = self.client.complete(prompt, system=SUMMARY_SYSTEM_PROMPT, max_tokens=300)
-            return summary.strip()
-        except Exception as e:
-            logger.error(f"Error generating summary: {e}")
-            # Fallback to extractive summary
-            return articles[0].description[:500] if articles[0].description else articles[0].title
+        Prompts run concurrently; see submit_titles_and_summaries.
+        Returns (None, None) for clusters the LLM did not answer.
+        """
+        with ThreadPoolExecutor(max_workers=LLM_CONCURRENCY) as pool:
+            results, futures = self.submit_titles_and_summaries(pool, clusters, titles)
+            return self.collect_titles_and_summaries(clusters, results, futures)
 
     def create_topics_from_groups(self, groups: List[Dict[str, Any]]) -> List[Topic]:
         """
         Create Topic database entries from semantic groups.
 
+        The batched summary requests are sent first; topics and their article
+        links are written while they are in flight, and the summaries are
+        filled in as the replies arrive.
+
         Args:
             groups: List of group dictionaries from group_articles()
 
@@ -179,54 +333,62 @@ Lead with the most surprising or consequential fact. Make it conversational and
             List of created Topic objects
         """
         created_topics = []
+        clusters = [group["articles"] for group in groups]
 
-        for group in groups:
-            articles = group["articles"]
-            title = group["title"]
-
-            # Generate AI summary
-            llm_summary = self.generate_topic_summary(articles, title)
-
-            # Extract keywords from article metadata
-            all_topics = []
-            for article in articles:
-                if article.llm_metadata and "topics" in article.llm_metadata:
-                    all_topics.extend(article.llm_metadata["topics"])
-
-            # Get unique keywords
-            keywords = list(dict.fromkeys(all_topics))[:10]
-
-            # Get best thumbnail
-            thumbnail = None
-            for article in articles:
-                if article.thumbnail:
-                    thumbnail = article.thumbnail
-                    break
-
-            # Create topic
-            topic = Topic(
-                title=title,
-                summary=llm_summary,  # Use LLM summary as main summary
-                llm_summary=llm_summary,
-                keywords=','.join(keywords),
-                thumbnail=thumbnail,
-                article_count=len(articles),
-                category=group.get("category"),
-                importance_score=group.get("importance", 0.5),
+        with ThreadPoolExecutor(max_workers=LLM_CONCURRENCY) as pool:
+            results, futures = self.submit_titles_and_summaries(
+                pool, clusters, [group["title"] for group in groups]
             )
-            db.session.add(topic)
-            db.session.flush()  # Get topic ID
-
-            # Link articles to topic
-            for i, article in enumerate(articles):
-                link = ArticleTopic(
-                    article_id=article.id,
-                    topic_id=topic.id,
-                    relevance_score=1.0 - (i * 0.05)  # Slightly decrease for later articles
-                )
-                db.session.add(link)
 
-            created_topics.append(topic)
+            for group in groups:
+                articles = group["articles"]
+
+                # Extract keywords from article metadata
+                all_topics = []
+                for article in articles:
+                    if article.llm_metadata and "topics" in article.llm_metadata:
+                        all_topics.extend(article.llm_metadata["topics"])
+
+                # Get unique keywords
+                keywords = list(dict.fromkeys(all_topics))[:10]
+
+                # Get best thumbnail
+                thumbnail = None
+                for article in articles:
+                    if article.thumbnail:
+                        thumbnail = article.thumbnail
+                        break
+
+                # Create topic; the summary is set once the LLM answers
+                topic = Topic(
+                    title=group["title"],
+                    keywords=','.join(keywords),
+                    thumbnail=thumbnail,
+                    article_count=len(articles),
+                    category=group.get("category"),
+                    importance_score=group.get("importance", 0.5),
+                )
+                db.session.add(topic)
+                created_topics.append(topic)
+
+            # One flush assigns every topic id; links then go in as one bulk INSERT
+            db.session.flush()
+            db.session.bulk_insert_mappings(ArticleTopic, [
+                {
+                    "article_id": article.id,
+                    "topic_id": topic.id,
+                    "relevance_score": 1.0 - (i * 0.05),  # Slightly decrease for later articles
+                }
+                for topic, articles in zip(created_topics, clusters)
+                for i, article in enumerate(articles)
+            ])
+
+            summaries = self.collect_titles_and_summaries(clusters, results, futures)
+
+        for topic, articles, (_, llm_summary) in zip(created_topics, clusters, summaries):
+            llm_summary = (llm_summary or self.fallback_summary(articles)) if articles else ""
+            topic.summary = llm_summary  # Use LLM summary as main summary
+            topic.llm_summary = llm_summary
 
         db.session.commit()
         logger.info(f"Created {len(created_topics)} topics with AI summaries")
@@ -1,29 +1,43 @@
+import math
 import os
 import re
+import string
 from html import unescape
 from collections import Counter
 from datetime import datetime, timedelta
-from typing import List, Dict, Set, Tuple, Optional
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional
 import logging
 from app import db
 from app.models.article import Article
 from app.models.topic import Topic, ArticleTopic
+from app.services.semantic_cache import title_cache
 
 logger = logging.getLogger(__name__)
 
 
+_HTML_RE = re.compile(r'<[^>]+>')
+_WS_RE = re.compile(r'\s+')
+_PUNCT_RE = re.compile(r'[^\w\s]')
+# Same replacement as _PUNCT_RE for ASCII text ('_' counts as a word character)
+_PUNCT_CHARS = string.punctuation.replace('_', '')
+_PUNCT_TABLE = str.maketrans(_PUNCT_CHARS, ' ' * len(_PUNCT_CHARS))
+_SENT_RE = re.compile(r'[.!?]+')
+
+
 def strip_html(text: str) -> str:
     """Remove HTML tags and decode entities from text."""
     if not text:
         return ""
     text = unescape(text)
-    text = re.sub(r'<[^>]+>', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    # Plain-text titles (the common case) skip the tag regex entirely
+    if '<' in text:
+        text = _HTML_RE.sub(' ', text)
+    return _WS_RE.sub(' ', text).strip()
 
 
 # Common stop words to filter out
-STOP_WORDS = {
+STOP_WORDS = frozenset({
     'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with',
     'by', 'from', 'as', 'is', 'was', 'are', 'were', 'been', 'be', 'have', 'has', 'had',
     'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must',
@@ -61,7 +75,62 @@ STOP_WORDS = {
     'raise', 'raised', 'pass', 'passed', 'sell', 'sold', 'require', 'required', 'report', 'reported',
     'decide', 'decided', 'pull', 'pulled', 'like', 'liked', 'bbc', 'news', 'reuters', 'ap',
     'cnn', 'nyt', 'times', 'post', 'guardian', 'abc', 'nbc', 'cbs', 'fox'
-}
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words of text with HTML, punctuation, stop words and short words removed."""
+    text = text.lower()
+    text = _HTML_RE.sub(' ', text)  # Remove HTML
+    # Remove punctuation; translate is a single C pass but only fast on ASCII
+    text = text.translate(_PUNCT_TABLE) if text.isascii() else _PUNCT_RE.sub(' ', text)
+    return [w for w in text.split() if w not in STOP_WORDS and len(w) > 2]
+
+
+TITLE_SYSTEM_PROMPT = """You are a viral news editor crafting headlines that people can't help but click.
+
+For TITLES:
+- Hook readers with intrigue, surprise, or emotion
+- Be specific and concrete, not vague
+- Use active verbs and vivid language
+- AVOID: "Breaking:", "Latest:", "Update:", "Report:", or any generic news-speak
+- AVOID: Bland phrases like "announces", "reveals", "amid concerns"
+- Good: "Tesla's Secret Factory Churns Out Robots at Midnight"
+- Bad: "Tesla Announces New Robotics Manufacturing Facility"
+
+Be factual but compelling. Make readers curious."""
+
+
+@lru_cache(maxsize=4096)
+def term_counts(text: str) -> Tuple[Tuple[str, int], ...]:
+    """
+    Token counts of one article text, memoized across clustering runs.
+
+    Scheduled runs re-cluster a rolling window, so most articles were
+    tokenized by an earlier run; the text itself is the cache key, so
+    edited articles are simply tokenized again.
+    """
+    return tuple(Counter(tokenize(text)).items())
+
+
+def topic_cache_key(articles: List[Article]) -> List[str]:
+    """Tokens of a topic's lead headlines, used to look up cached LLM responses."""
+    return tokenize(' '.join(strip_html(a.title) for a in articles[:5]))
+
+
+def pick_thumbnail(articles: List[Article]) -> Optional[str]:
+    """First http(s) thumbnail that isn't an icon or logo, else the first http(s) one."""
+    fallback = None
+    for article in articles:
+        url = article.thumbnail
+        if url and url.startswith(('http://', 'https://')):
+            lowered = url.lower()
+            # Skip very small images or icons
+            if 'icon' not in lowered and 'logo' not in lowered:
+                return url
+            if fallback is None:
+                fallback = url
+    return fallback
 
 
 class TopicAnalyzer:
@@ -73,28 +142,10 @@ class TopicAnalyzer:
         if not text:
             return []
 
-        # Clean and tokenize
-        text = text.lower()
-        text = re.sub(r'<[^>]+>', ' ', text)  # Remove HTML
-        text = re.sub(r'[^\w\s]', ' ', text)  # Remove punctuation
-        words = text.split()
-
-        # Filter stop words and short words
-        words = [w for w in words if w not in STOP_WORDS and len(w) > 2]
-
         # Count and get most common
-        word_counts = Counter(words)
+        word_counts = Counter(tokenize(text))
         return [word for word, _ in word_counts.most_common(max_keywords)]
 
-    @staticmethod
-    def calculate_similarity(keywords1: Set[str], keywords2: Set[str]) -> float:
-        """Calculate Jaccard similarity between two keyword sets."""
-        if not keywords1 or not keywords2:
-            return 0.0
-        intersection = len(keywords1 & keywords2)
-        union = len(keywords1 | keywords2)
-        return intersection / union if union > 0 else 0.0
-
     @staticmethod
     def generate_summary(articles: List[Article], max_sentences: int = 3) -> str:
         """Generate a summary from multiple articles using extractive summarization."""
@@ -103,7 +154,7 @@ class TopicAnalyzer:
         for article in articles[:5]:  # Use top 5 articles
             text = strip_html(article.description or article.title)
             # Split into sentences
-            sentences = re.split(r'[.!?]+', text)
+            sentences = _SENT_RE.split(text)
             for sent in sentences:
                 sent = sent.strip()
                 if len(sent) > 30 and len(sent) < 300:
@@ -113,14 +164,12 @@ class TopicAnalyzer:
             return strip_html(articles[0].title) if articles else ""
 
         # Score sentences by keyword frequency
-        all_text = ' '.join([strip_html(a.title + ' ' + (a.description or '')) for a in articles])
+        # Strip the whole batch as one document rather than one call per article
+        all_text = strip_html(' '.join(f"{a.title} {a.description or ''}" for a in articles))
         keywords = set(TopicAnalyzer.extract_keywords(all_text, 20))
 
-        scored = []
-        for sent in all_sentences:
-            words = set(sent.lower().split())
-            score = len(words & keywords)
-            scored.append((score, sent))
+        # intersection() consumes the word list directly, without a set per sentence
+        scored = [(len(keywords.intersection(sent.lower().split())), sent) for sent in all_sentences]
 
         # Get top sentences
         scored.sort(reverse=True)
@@ -131,21 +180,21 @@ class TopicAnalyzer:
     @staticmethod
     def generate_topic_title_llm(articles: List[Article]) -> Tuple[str, str]:
         """Generate title and summary using LLM."""
-        try:
-            from app.services.llm_client import LLMClientFactory
-            if not LLMClientFactory.is_available():
-                return None, None
-
-            client = LLMClientFactory.create()
-
-            # Prepare article info
-            article_info = []
-            for a in articles[:5]:
-                title = strip_html(a.title)
-                desc = strip_html(a.description or '')[:200]
-                article_info.append(f"- {title}: {desc}")
+        return TopicAnalyzer._complete_title(
+            TopicAnalyzer.build_title_prompt(articles), topic_cache_key(articles)
+        )
 
-            prompt = f"""Based on these related news articles, generate:
+    @staticmethod
+    def build_title_prompt(articles: List[Article]) -> str:
+        """Build the title/summary prompt for a cluster's articles."""
+        # Prepare article info
+        article_info = []
+        for a in articles[:5]:
+            title = strip_html(a.title)
+            desc = strip_html(a.description or '')[:200]
+            article_info.append(f"- {title}: {desc}")
+
+        return f"""Based on these related news articles, generate:
 1. A catchy, engaging topic title (max 10 words) that hooks readers
 2. A 2-sentence summary that leads with the most interesting fact
 
@@ -155,35 +204,51 @@ Articles:
 Respond in JSON format:
 {{"title": "Your Catchy Title Here", "summary": "Lead with the hook. Follow with key details."}}"""
 
-            system = """You are a viral news editor crafting headlines that people can't help but click.
+    @staticmethod
+    def _complete_title(prompt: str, cache_key: Optional[List[str]] = None) -> Tuple[str, str]:
+        """
+        Send one title prompt to the LLM (safe to call from worker threads).
 
-For TITLES:
-- Hook readers with intrigue, surprise, or emotion
-- Be specific and concrete, not vague
-- Use active verbs and vivid language
-- AVOID: "Breaking:", "Latest:", "Update:", "Report:", or any generic news-speak
-- AVOID: Bland phrases like "announces", "reveals", "amid concerns"
-- Good: "Tesla's Secret Factory Churns Out Robots at Midnight"
-- Bad: "Tesla Announces New Robotics Manufacturing Facility"
+        A near-identical cluster seen recently (same cache_key tokens) reuses
+        its title and summary without another LLM call.
+        """
+        if cache_key:
+            cached = title_cache.get(cache_key)
+            if cached is not None:
+                return cached
 
-Be factual but compelling. Make readers curious."""
-            result = client.complete_json(prompt, system=system, max_tokens=200)
+        try:
+            from app.services.llm_client import LLMClientFactory
+            if not LLMClientFactory.is_available():
+                return None, None
 
-            return result.get('title'), result.get('summary')
+            client = LLMClientFactory.create()
+            result = client.complete_json(prompt, system=TITLE_SYSTEM_PROMPT, max_tokens=200)
+
+            title, summary = result.get('title'), result.get('summary')
+            if cache_key and title:
+                title_cache.set(cache_key, (title, summary))
+            return title, summary
         except Exception as e:
             logger.error(f"LLM title generation failed: {e}")
             return None, None
 
     @staticmethod
-    def generate_topic_title(articles: List[Article], keywords: List[str]) -> str:
-        """Generate a title for the topic cluster using the lead article's headline."""
+    def generate_topic_title(articles: List[Article], keywords: List[str], use_llm: bool = True) -> str:
+        """
+        Generate a title for the topic cluster using the lead article's headline.
+
+        With use_llm (the default) an LLM title is tried first; pass False when
+        the caller already asked the LLM for this cluster.
+        """
         if not articles:
             return "News Update"
 
         # Try LLM first
-        llm_title, _ = TopicAnalyzer.generate_topic_title_llm(articles)
-        if llm_title:
-            return llm_title
+        if use_llm:
+            llm_title, _ = TopicAnalyzer.generate_topic_title_llm(articles)
+            if llm_title:
+                return llm_title
 
         # Use the lead article's title — it's the most descriptive option
         lead_title = strip_html(articles[0].title).strip()
@@ -201,10 +266,34 @@ Be factual but compelling. Make readers curious."""
 
         return "News Update"
 
+    @staticmethod
+    def tfidf_vectors(texts: List[str]) -> List[Dict[str, float]]:
+        """
+        Build L2-normalized TF-IDF vectors (term -> weight) for a list of texts.
+
+        Uses the same tokenization as extract_keywords and smoothed IDF
+        (log((1 + n) / (1 + df)) + 1), so the vectors are sparse dicts.
+        """
+        counts = [dict(term_counts(text)) for text in texts]
+        doc_freq = Counter(term for tf in counts for term in tf)
+        n = len(texts)
+        idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in doc_freq.items()}
+
+        vectors = []
+        for tf in counts:
+            weights = {term: count * idf[term] for term, count in tf.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            vectors.append({term: w / norm for term, w in weights.items()} if norm else {})
+        return vectors
+
     @staticmethod
     def cluster_articles(hours: int = 24, similarity_threshold: float = 0.25, max_articles: int = 500) -> List[Dict]:
-        """Cluster recent articles into topics using inverted index for speed."""
-        # Get recent articles (cap to avoid O(n^2) blowup)
+        """
+        Cluster recent articles into topics by TF-IDF cosine similarity.
+
+        Articles whose vectors have cosine >= similarity_threshold are linked,
+        and clusters are the connected components of that graph.
+        """
         since = datetime.utcnow() - timedelta(hours=hours)
         articles = Article.query.filter(
             Article.fetched_at >= since
@@ -213,55 +302,52 @@ Be factual but compelling. Make readers curious."""
         if not articles:
             return []
 
-        # Extract keywords for each article
-        article_keywords = {}
-        for article in articles:
-            text = f"{article.title} {article.description or ''}"
-            keywords = set(TopicAnalyzer.extract_keywords(text, 15))
-            article_keywords[article.id] = keywords
-
-        # Build inverted index: keyword -> set of article IDs
-        keyword_to_articles: Dict[str, Set[int]] = {}
-        for aid, kws in article_keywords.items():
-            for kw in kws:
-                if kw not in keyword_to_articles:
-                    keyword_to_articles[kw] = set()
-                keyword_to_articles[kw].add(aid)
-
-        # For each article, find candidates that share at least one keyword
-        article_by_id = {a.id: a for a in articles}
+        vectors = TopicAnalyzer.tfidf_vectors(
+            [f"{article.title} {article.description or ''}" for article in articles]
+        )
+
+        # Sparse X @ X.T through term postings: only pairs sharing a term get a score
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for i, vector in enumerate(vectors):
+            for term, weight in vector.items():
+                postings.setdefault(term, []).append((i, weight))
+
+        dot: Dict[Tuple[int, int], float] = Counter()
+        for entries in postings.values():
+            for a in range(len(entries)):
+                i, wi = entries[a]
+                for j, wj in entries[a + 1:]:
+                    dot[i, j] += wi * wj
+
+        # Connected components over the thresholded similarity graph (union-find)
+        parent = list(range(len(articles)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for (i, j), similarity in dot.items():
+            if similarity >= similarity_threshold:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    # Keep the lower index as root so clusters lead with the newest article
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        members: Dict[int, List[int]] = {}
+        for i in range(len(articles)):
+            members.setdefault(find(i), []).append(i)
 
         clusters = []
-        clustered_ids = set()
-
-        for article in articles:
-            if article.id in clustered_ids:
-                continue
-
-            cluster = [article]
-            cluster_keywords = article_keywords[article.id].copy()
-            clustered_ids.add(article.id)
-
-            # Get candidate articles via inverted index
-            candidate_ids = set()
-            for kw in article_keywords[article.id]:
-                candidate_ids |= keyword_to_articles.get(kw, set())
-            candidate_ids -= clustered_ids
-
-            # Check similarity only for candidates sharing keywords
-            for cid in candidate_ids:
-                similarity = TopicAnalyzer.calculate_similarity(
-                    cluster_keywords,
-                    article_keywords[cid]
-                )
-                if similarity >= similarity_threshold:
-                    cluster.append(article_by_id[cid])
-                    cluster_keywords |= article_keywords[cid]
-                    clustered_ids.add(cid)
-
+        for indices in members.values():
+            # Cluster keywords are the terms with the highest total weight
+            weights = Counter()
+            for i in indices:
+                weights.update(vectors[i])
             clusters.append({
-                'articles': cluster,
-                'keywords': list(cluster_keywords)[:10]
+                'articles': [articles[i] for i in indices],
+                'keywords': [term for term, _ in weights.most_common(10)],
             })
 
         return clusters
@@ -292,6 +378,9 @@ Be factual but compelling. Make readers curious."""
         Topic.query.filter(Topic.created_at < old_date).delete()
         db.session.commit()
 
+        # Set once the LLM has errored, so the fallback below doesn't call it again
+        llm_failed = False
+
         # Use LLM-powered semantic grouping if enabled and available
         if use_llm:
             try:
@@ -309,38 +398,33 @@ Be factual but compelling. Make readers curious."""
                     logger.info("LLM not available, falling back to keyword clustering")
             except Exception as e:
                 logger.error(f"LLM grouping failed, falling back to keywords: {e}")
+                llm_failed = True
 
         # Fallback to keyword-based clustering
         logger.info("Using keyword-based clustering")
         clusters = TopicAnalyzer.cluster_articles(hours=hours)
 
+        # Request every LLM title/summary up front, several clusters per call
+        from app.services.llm_client import LLMClientFactory
+        llm_results = [(None, None)] * len(clusters)
+        if clusters and not llm_failed and LLMClientFactory.is_available():
+            from app.services.semantic_grouper import SemanticGrouper
+            llm_results = SemanticGrouper().generate_titles_and_summaries(
+                [cluster_data['articles'] for cluster_data in clusters]
+            )
+
         created_topics = []
-        for cluster_data in clusters:
+        topic_articles = []
+        for cluster_data, (llm_title, llm_summary) in zip(clusters, llm_results):
             articles = cluster_data['articles']
             keywords = cluster_data['keywords']
 
-            # Try to get LLM-generated title and summary
-            llm_title, llm_summary = TopicAnalyzer.generate_topic_title_llm(articles)
-
-            # Use LLM results or fall back to extractive methods
-            title = llm_title or TopicAnalyzer.generate_topic_title(articles, keywords)
+            # Use LLM results or fall back to extractive methods (the LLM
+            # already had its chance above, so don't ask it again per cluster)
+            title = llm_title or TopicAnalyzer.generate_topic_title(articles, keywords, use_llm=False)
             summary = llm_summary or TopicAnalyzer.generate_summary(articles)
 
-            # Get best thumbnail - prefer valid image URLs
-            thumbnail = None
-            for article in articles:
-                if article.thumbnail and article.thumbnail.startswith(('http://', 'https://')):
-                    # Skip very small images or icons
-                    if 'icon' not in article.thumbnail.lower() and 'logo' not in article.thumbnail.lower():
-                        thumbnail = article.thumbnail
-                        break
-
-            # If no good thumbnail found, try any valid URL
-            if not thumbnail:
-                for article in articles:
-                    if article.thumbnail and article.thumbnail.startswith(('http://', 'https://')):
-                        thumbnail = article.thumbnail
-                        break
+            thumbnail = pick_thumbnail(articles)
 
             # Create topic
             topic = Topic(
@@ -353,18 +437,20 @@ Be factual but compelling. Make readers curious."""
                 importance_score=0.5,  # Default importance for keyword-based topics
             )
             db.session.add(topic)
-            db.session.flush()  # Get the topic ID
-
-            # Link articles to topic
-            for i, article in enumerate(articles):
-                link = ArticleTopic(
-                    article_id=article.id,
-                    topic_id=topic.id,
-                    relevance_score=1.0 - (i * 0.1)  # Decrease score for later articles
-                )
-                db.session.add(link)
-
+            topic_articles.append(articles)
             created_topics.append(topic)
 
+        # One flush assigns every topic id; links then go in as one bulk INSERT
+        db.session.flush()
+        db.session.bulk_insert_mappings(ArticleTopic, [
+            {
+                'article_id': article.id,
+                'topic_id': topic.id,
+                'relevance_score': 1.0 - (i * 0.1),  # Decrease score for later articles
+            }
+            for topic, articles in zip(created_topics, topic_articles)
+            for i, article in enumerate(articles)
+        ])
+
         db.session.commit()
         return created_topics
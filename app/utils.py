@@ -0,0 +1,18 @@
+"""Small shared helpers."""
+from datetime import datetime
+
+try:
+    from ciso8601 import parse_datetime as _c_parse_datetime
+except ImportError:
+    _c_parse_datetime = None
+
+
+def parse_iso_datetime(value: str) -> datetime:
+    """
+    Parse an ISO 8601 timestamp, accepting a trailing 'Z' for UTC.
+
+    Uses the C-coded ciso8601 parser when installed. Raises ValueError on bad input.
+    """
+    if _c_parse_datetime is not None:
+        return _c_parse_datetime(value)
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session, sessionmaker
+from app import create_app, db
+from app.services.semantic_cache import title_cache
+
+
+@pytest.fixture(scope='session')
+def app():
+    """Create the test application and its schema once per test run."""
+    return create_app('testing')
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    """Create one test client for the run; the app sets no cookies, so it keeps no state between tests."""
+    return app.test_client()
+
+
+@pytest.fixture(autouse=True)
+def db_session(app):
+    """Run each test inside a transaction that is rolled back afterwards."""
+    with app.app_context():
+        connection = db.engine.connect()
+        # pysqlite's implicit transactions break SAVEPOINTs; let SQLAlchemy emit BEGIN
+        driver_connection = connection.connection.driver_connection
+        driver_connection.isolation_level = None
+        event.listen(connection, 'begin', lambda conn: conn.exec_driver_sql('BEGIN'))
+        transaction = connection.begin()
+
+        # Every app context (tests, fixtures, requests) gets a session on this
+        # connection; their commits only release savepoints
+        app_session = db.session
+        db.session = scoped_session(
+            sessionmaker(bind=connection, join_transaction_mode='create_savepoint'),
+            scopefunc=app_session.registry.scopefunc,
+        )
+        try:
+            yield db.session
+        finally:
+            db.session.remove()
+            db.session = app_session
+            transaction.rollback()
+            driver_connection.isolation_level = ''
+            connection.close()
+
+    app.extensions['response_cache'].clear()
+    title_cache.clear()
@@ -1,26 +1,12 @@
+import json
 import pytest
-from app import create_app, db
-from app.models import Feed, Article
-from datetime import datetime
+from unittest.mock import patch, MagicMock
+from app import db
+from app.models import Feed, Article, Topic, ArticleTopic
+from datetime import datetime, timedelta
 
-
-@pytest.fixture
-def app():
-    """Create test application."""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
-
-
-@pytest.fixture
-def client(app):
-    """Create test client."""
-    return app.test_client()
+# Fixed publication time so sample data is the same on every run
+_FROZEN_NOW = datetime(2024, 1, 1, 12, 0, 0)
 
 
 @pytest.fixture
@@ -51,13 +37,30 @@ def sample_article(app, sample_feed):
             description='Test description',
             content='Full test content',
             author='Test Author',
-            published_at=datetime.utcnow()
+            published_at=_FROZEN_NOW
         )
         db.session.add(article)
         db.session.commit()
         return article.id
 
 
+@pytest.fixture
+def sample_topic(app, sample_article):
+    """Create a sample topic linked to the sample article."""
+    with app.app_context():
+        topic = Topic(
+            title='Test Topic',
+            keywords='test,topic',
+            article_count=1,
+            category='Technology',
+            importance_score=0.8
+        )
+        topic.articles.append(ArticleTopic(article_id=sample_article))
+        db.session.add(topic)
+        db.session.commit()
+        return topic.id
+
+
 class TestHealthEndpoint:
     def test_health_check(self, client):
         """Test health endpoint returns healthy status."""
@@ -68,15 +71,26 @@ class TestHealthEndpoint:
         assert 'timestamp' in data
 
 
-class TestFeedsAPI:
-    def test_list_feeds_empty(self, client):
-        """Test listing feeds when empty."""
-        response = client.get('/feeds')
+class TestEmptyListings:
+    @pytest.mark.parametrize('path,key', [
+        ('/feeds', 'feeds'),
+        ('/articles', 'articles'),
+        ('/articles/latest', 'articles'),
+        ('/api/v1/news', 'news'),
+        ('/api/v1/categories', 'categories'),
+        ('/topics', 'topics'),
+        ('/topics/top', 'topics'),
+    ])
+    def test_list_empty(self, client, path, key):
+        """Test list endpoints return an empty list when there is no data."""
+        response = client.get(path)
         assert response.status_code == 200
         data = response.get_json()
-        assert data['feeds'] == []
-        assert data['count'] == 0
+        assert data[key] == []
+        assert data.get('count', 0) == 0
+
 
+class TestFeedsAPI:
     def test_list_feeds_with_data(self, client, sample_feed):
         """Test listing feeds with data."""
         response = client.get('/feeds')
@@ -85,6 +99,13 @@ class TestFeedsAPI:
         assert data['count'] == 1
         assert data['feeds'][0]['name'] == 'Test Feed'
 
+    def test_list_feeds_article_count(self, client, sample_article):
+        """Test listing feeds includes article counts."""
+        response = client.get('/feeds')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['feeds'][0]['article_count'] == 1
+
     def test_get_feed(self, client, sample_feed):
         """Test getting a specific feed."""
         response = client.get(f'/feeds/{sample_feed}')
@@ -109,24 +130,17 @@ class TestFeedsAPI:
         assert data['feed']['name'] == 'Updated Feed'
         assert data['feed']['category'] == 'news'
 
-    def test_delete_feed(self, client, sample_feed):
+    def test_delete_feed(self, app, client, sample_feed):
         """Test deleting a feed."""
         response = client.delete(f'/feeds/{sample_feed}')
         assert response.status_code == 200
 
         # Verify it's gone
-        response = client.get(f'/feeds/{sample_feed}')
-        assert response.status_code == 404
+        with app.app_context():
+            assert db.session.get(Feed, sample_feed) is None
 
 
 class TestArticlesAPI:
-    def test_list_articles_empty(self, client):
-        """Test listing articles when empty."""
-        response = client.get('/articles')
-        assert response.status_code == 200
-        data = response.get_json()
-        assert data['articles'] == []
-
     def test_list_articles_with_data(self, client, sample_article):
         """Test listing articles with data."""
         response = client.get('/articles')
@@ -134,6 +148,17 @@ class TestArticlesAPI:
         data = response.get_json()
         assert len(data['articles']) == 1
         assert data['articles'][0]['title'] == 'Test Article'
+        assert data['articles'][0]['feed_name'] == 'Test Feed'
+
+    def test_list_articles_include_total(self, client, sample_article):
+        """Test article totals are only counted on request."""
+        data = client.get('/articles').get_json()
+        assert data['pagination']['total'] is None
+        assert data['pagination']['has_next'] is False
+
+        data = client.get('/articles?include_total=true').get_json()
+        assert data['pagination']['total'] == 1
+        assert data['pagination']['pages'] == 1
 
     def test_get_article(self, client, sample_article):
         """Test getting a specific article."""
@@ -150,29 +175,54 @@ class TestArticlesAPI:
         data = response.get_json()
         assert data['count'] == 1
 
-    def test_mark_read(self, client, sample_article):
-        """Test marking article as read."""
-        response = client.post(f'/articles/{sample_article}/read')
+    @pytest.mark.parametrize('verb,field,expected', [
+        ('read', 'is_read', True),
+        ('unread', 'is_read', False),
+        ('star', 'is_starred', True),
+        ('unstar', 'is_starred', False),
+    ])
+    def test_article_flag(self, app, client, sample_article, verb, field, expected):
+        """Test read/unread/star/unstar flip the flag and return the updated article."""
+        with app.app_context():
+            setattr(db.session.get(Article, sample_article), field, not expected)
+            db.session.commit()
+
+        response = client.post(f'/articles/{sample_article}/{verb}')
         assert response.status_code == 200
         data = response.get_json()
-        assert data['article']['is_read'] is True
+        assert data['article'][field] is expected
+        assert data['article']['feed_name'] == 'Test Feed'
 
-    def test_mark_unread(self, client, sample_article):
-        """Test marking article as unread."""
-        # First mark as read
-        client.post(f'/articles/{sample_article}/read')
-        # Then mark as unread
-        response = client.post(f'/articles/{sample_article}/unread')
-        assert response.status_code == 200
-        data = response.get_json()
-        assert data['article']['is_read'] is False
+    def test_star_article_not_found(self, client):
+        """Test starring a non-existent article."""
+        response = client.post('/articles/999/star')
+        assert response.status_code == 404
 
-    def test_star_article(self, client, sample_article):
-        """Test starring an article."""
-        response = client.post(f'/articles/{sample_article}/star')
+    def test_bulk_mark_read(self, client, sample_article):
+        """Test marking several articles read in one request."""
+        response = client.post('/articles/mark-read', json={'ids': [sample_article, 999]})
         assert response.status_code == 200
-        data = response.get_json()
-        assert data['article']['is_starred'] is True
+        assert response.get_json()['updated'] == 1
+
+        data = client.get(f'/articles/{sample_article}').get_json()
+        assert data['article']['is_read'] is True
+
+    def test_bulk_mark_read_requires_ids(self, client):
+        """Test bulk mark-read rejects a missing ids list."""
+        response = client.post('/articles/mark-read', json={})
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize('body', [
+        {'ids': [{'x': 1}]},
+        {'ids': ['abc']},
+        {'ids': [True]},
+        {'ids': [1], 'is_read': 'false'},
+        {'ids': [1], 'is_read': 0},
+    ])
+    def test_bulk_mark_read_rejects_invalid_body(self, client, body):
+        """Test bulk mark-read rejects non-integer ids and non-boolean is_read."""
+        response = client.post('/articles/mark-read', json=body)
+        assert response.status_code == 400
 
     def test_filter_by_feed(self, client, sample_feed, sample_article):
         """Test filtering articles by feed."""
@@ -212,6 +262,57 @@ class TestNewsAPI:
         data = response.get_json()
         assert data['meta']['limit'] == 10
 
+    def test_get_news_cursor_pagination(self, app, client, sample_feed):
+        """Test news endpoint pages with a keyset cursor."""
+        with app.app_context():
+            now = datetime.utcnow()
+            for i in range(3):
+                db.session.add(Article(
+                    feed_id=sample_feed,
+                    guid=f'cursor-guid-{i}',
+                    title=f'Cursor Article {i}',
+                    published_at=now - timedelta(hours=i)
+                ))
+            db.session.commit()
+
+        response = client.get('/api/v1/news?limit=2&include_total=true')
+        data = response.get_json()
+        assert [a['title'] for a in data['news']] == ['Cursor Article 0', 'Cursor Article 1']
+        assert data['meta']['has_more'] is True
+        assert data['meta']['total'] == 3
+
+        cursor = data['meta']['next_cursor']
+        response = client.get('/api/v1/news', query_string={'limit': 2, **cursor})
+        data = response.get_json()
+        assert [a['title'] for a in data['news']] == ['Cursor Article 2']
+        assert data['meta']['has_more'] is False
+        assert data['meta']['next_cursor'] is None
+
+    def test_get_news_cursor_reaches_undated(self, app, client, sample_feed):
+        """Test keyset paging orders undated articles last and still reaches them."""
+        with app.app_context():
+            now = datetime.utcnow()
+            for i, published_at in enumerate([now, None, now - timedelta(hours=1), None]):
+                db.session.add(Article(
+                    feed_id=sample_feed,
+                    guid=f'undated-guid-{i}',
+                    title=f'Undated {i}',
+                    published_at=published_at
+                ))
+            db.session.commit()
+
+        titles = []
+        query = {'limit': 1}
+        while True:
+            data = client.get('/api/v1/news', query_string=query).get_json()
+            titles += [a['title'] for a in data['news']]
+            if not data['meta']['has_more']:
+                break
+            assert data['meta']['next_cursor'] is not None
+            query = {'limit': 1, **data['meta']['next_cursor']}
+
+        assert titles == ['Undated 0', 'Undated 2', 'Undated 3', 'Undated 1']
+
     def test_get_news_stream(self, client, sample_article):
         """Test news stream endpoint."""
         response = client.get('/api/v1/news/stream')
@@ -220,6 +321,15 @@ class TestNewsAPI:
         assert 'items' in data
         assert 'poll_after' in data
 
+    def test_get_news_stream_ndjson(self, client, sample_article):
+        """Test news stream endpoint emits one JSON document per line."""
+        response = client.get('/api/v1/news/stream?format=ndjson')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])['title'] == 'Test Article'
+
 
 class TestStatsAPI:
     def test_get_stats(self, client, sample_feed, sample_article):
@@ -228,7 +338,51 @@ class TestStatsAPI:
         assert response.status_code == 200
         data = response.get_json()
         assert data['feeds']['total'] == 1
+        assert data['feeds']['active'] == 1
         assert data['articles']['total'] == 1
+        assert data['articles']['unread'] == 1
+        assert data['articles']['starred'] == 0
+        assert data['articles']['last_24h'] == 1
+
+    def test_stats_cached(self, client, sample_article):
+        """Test stats responses are served from cache on repeat calls."""
+        first = client.get('/api/v1/stats')
+        assert first.headers['X-Cache'] == 'MISS'
+        second = client.get('/api/v1/stats')
+        assert second.headers['X-Cache'] == 'HIT'
+        assert second.get_json() == first.get_json()
+
+    def test_stats_cache_cleared_by_mark_all_read(self, client, sample_article):
+        """Test marking everything read invalidates cached stats."""
+        assert client.get('/api/v1/stats').get_json()['articles']['unread'] == 1
+
+        client.post('/articles/mark-all-read')
+
+        response = client.get('/api/v1/stats')
+        assert response.headers['X-Cache'] == 'MISS'
+        assert response.get_json()['articles']['unread'] == 0
+
+    @patch('app.routes.feeds.RSSParser.parse', return_value={'feed': {'title': 'New', 'description': ''}, 'entries': []})
+    def test_stats_cache_cleared_by_feed_writes(self, mock_parse, client, sample_feed):
+        """Test creating, updating and deleting feeds invalidate cached stats."""
+        assert client.get('/api/v1/stats').get_json()['feeds']['total'] == 1
+
+        client.post('/feeds', json={'url': 'https://new.example.com/rss', 'fetch_now': False})
+        assert client.get('/api/v1/stats').get_json()['feeds']['total'] == 2
+
+        client.put(f'/feeds/{sample_feed}', json={'is_active': False})
+        assert client.get('/api/v1/stats').get_json()['feeds']['active'] == 1
+
+        client.delete(f'/feeds/{sample_feed}')
+        assert client.get('/api/v1/stats').get_json()['feeds']['total'] == 1
+
+    def test_analysis_status(self, app, client, sample_article):
+        """Test analysis status reports LLM availability computed at startup."""
+        response = client.get('/api/v1/analysis/status')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['llm_available'] == app.extensions['llm_available']
+        assert data['progress']['pending'] == 1
 
     def test_get_categories(self, client, sample_feed, sample_article):
         """Test categories endpoint."""
@@ -237,3 +391,168 @@ class TestStatsAPI:
         data = response.get_json()
         assert len(data['categories']) == 1
         assert data['categories'][0]['name'] == 'tech'
+
+
+class TestTopicsAPI:
+    def test_get_top_topics(self, client, sample_topic):
+        """Test top topics include their source feeds."""
+        response = client.get('/topics/top')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['count'] == 1
+        assert data['topics'][0]['sources'] == ['Test Feed']
+
+    def test_top_topics_cache_follows_topic_updates(self, app, client, sample_topic):
+        """Test cached top topics are replaced once a topic changes."""
+        assert client.get('/topics/top').headers['X-Cache'] == 'MISS'
+        assert client.get('/topics/top').headers['X-Cache'] == 'HIT'
+
+        with app.app_context():
+            topic = db.session.get(Topic, sample_topic)
+            topic.title = 'Renamed Topic'
+            topic.updated_at = datetime.utcnow() + timedelta(seconds=1)
+            db.session.commit()
+
+        response = client.get('/topics/top')
+        assert response.headers['X-Cache'] == 'MISS'
+        assert response.get_json()['topics'][0]['title'] == 'Renamed Topic'
+
+    def test_top_topics_penalize_routine_news(self, app, client, sample_topic):
+        """Test routine keywords lower a topic's ranking score."""
+        with app.app_context():
+            db.session.add(Topic(
+                title='Weekly report on tests',
+                article_count=1,
+                category='Science',
+                importance_score=0.8
+            ))
+            db.session.commit()
+
+        data = client.get('/topics/top').get_json()
+        assert [t['title'] for t in data['topics']] == ['Test Topic', 'Weekly report on tests']
+        assert data['topics'][1]['ranking_score'] < data['topics'][0]['ranking_score']
+
+    def test_top_topics_zero_importance_stays_candidate(self, app, client, sample_topic):
+        """Test the database pre-rank treats zero importance as 0.5, like the final score."""
+        with app.app_context():
+            db.session.add_all([
+                Topic(title=f'Minor story {i}', article_count=1, category='World', importance_score=0.45)
+                for i in range(40)
+            ])
+            db.session.add(Topic(title='Unscored story', article_count=1, category='World', importance_score=0))
+            db.session.commit()
+
+        data = client.get('/topics/top').get_json()
+        assert 'Unscored story' in [t['title'] for t in data['topics']]
+
+    def test_list_topics_include_articles(self, client, sample_topic):
+        """Test listing topics with their articles."""
+        response = client.get('/topics?include_articles=true')
+        assert response.status_code == 200
+        assert response.is_streamed
+        data = response.get_json()
+        assert data['count'] == 1
+        assert data['topics'][0]['articles'][0]['title'] == 'Test Article'
+
+    @patch('app.routes.topics.LLMClientFactory')
+    def test_ask_about_topic(self, mock_factory, app, client, sample_topic, monkeypatch):
+        """Test topic Q&A sends the topic's articles to the shared LLM client."""
+        monkeypatch.setitem(app.extensions, 'llm_available', True)
+        llm = MagicMock()
+        llm.complete.return_value = 'An answer'
+        mock_factory.create.return_value = llm
+
+        response = client.post(f'/topics/{sample_topic}/ask', json={'question': 'What happened?'})
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['answer'] == 'An answer'
+        assert data['sources'][0]['source'] == 'Test Feed'
+
+        prompt = llm.complete.call_args.args[0]
+        assert 'Article from Test Feed:\nTitle: Test Article\nTest description' in prompt
+        assert 'Question: What happened?' in prompt
+        assert '"Test Topic"' in llm.complete.call_args.kwargs['system']
+        mock_factory.create.assert_called_once_with(app.config['LLM_PROVIDER'])
+
+    def test_ask_about_topic_llm_unavailable(self, app, client, sample_topic, monkeypatch):
+        """Test topic Q&A reports 503 when no LLM is configured."""
+        monkeypatch.setitem(app.extensions, 'llm_available', False)
+        response = client.post(f'/topics/{sample_topic}/ask', json={'question': 'Why?'})
+        assert response.status_code == 503
+
+    def test_get_similar_articles(self, app, client, sample_feed, sample_topic):
+        """Test similar articles exclude those already in the topic."""
+        with app.app_context():
+            now = datetime.utcnow()
+            for i in range(3):
+                db.session.add(Article(
+                    feed_id=sample_feed,
+                    guid=f'similar-guid-{i}',
+                    title=f'Similar Article {i}',
+                    llm_category='Technology',
+                    published_at=now - timedelta(hours=i)
+                ))
+            db.session.commit()
+
+        response = client.get(f'/topics/{sample_topic}/similar?limit=2')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [a['title'] for a in data['similar']] == ['Similar Article 0', 'Similar Article 1']
+
+        cursor = data['next_cursor']
+        data = client.get(f'/topics/{sample_topic}/similar', query_string={'limit': 2, **cursor}).get_json()
+        assert [a['title'] for a in data['similar']] == ['Similar Article 2']
+        assert data['next_cursor'] is None
+
+    def test_get_similar_articles_reaches_undated(self, app, client, sample_feed, sample_topic):
+        """Test similar-article paging orders undated articles last and still reaches them."""
+        with app.app_context():
+            for i, published_at in enumerate([None, datetime.utcnow(), None]):
+                db.session.add(Article(
+                    feed_id=sample_feed,
+                    guid=f'similar-undated-{i}',
+                    title=f'Similar Undated {i}',
+                    llm_category='Technology',
+                    published_at=published_at
+                ))
+            db.session.commit()
+
+        titles = []
+        query = {'limit': 1}
+        while True:
+            data = client.get(f'/topics/{sample_topic}/similar', query_string=query).get_json()
+            titles += [a['title'] for a in data['similar']]
+            if data['next_cursor'] is None:
+                break
+            query = {'limit': 1, **data['next_cursor']}
+
+        assert titles == ['Similar Undated 1', 'Similar Undated 2', 'Similar Undated 0']
+
+    def test_get_topic_images(self, app, client, sample_feed, sample_topic):
+        """Test topic image gallery returns each thumbnail once."""
+        with app.app_context():
+            topic = db.session.get(Topic, sample_topic)
+            for i in range(3):
+                article = Article(
+                    feed_id=sample_feed,
+                    guid=f'image-guid-{i}',
+                    title=f'Image Article {i}',
+                    thumbnail='https://example.com/a.jpg' if i < 2 else 'https://example.com/b.jpg'
+                )
+                topic.articles.append(ArticleTopic(article=article))
+            db.session.commit()
+
+        response = client.get(f'/topics/{sample_topic}/images')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [i['url'] for i in data['images']] == ['https://example.com/a.jpg', 'https://example.com/b.jpg']
+        assert data['images'][0]['title'] == 'Image Article 0'
+        assert data['images'][0]['source'] == 'Test Feed'
+        assert data['topic_title'] == 'Test Topic'
+        assert data['next_cursor'] is None
+
+        data = client.get(f'/topics/{sample_topic}/images?limit=1').get_json()
+        assert [i['url'] for i in data['images']] == ['https://example.com/a.jpg']
+        data = client.get(f'/topics/{sample_topic}/images', query_string={'limit': 1, **data['next_cursor']}).get_json()
+        assert [i['url'] for i in data['images']] == ['https://example.com/b.jpg']
+        assert data['next_cursor'] is None
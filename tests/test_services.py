@@ -1,22 +1,28 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from app import create_app, db
-from app.models import Feed, Article
-from app.services import RSSParser, FeedFetcher
-from datetime import datetime
+from feedparser import FeedParserDict
+from app import db
+from app.models import Feed, Article, ArticleTopic
+from app.services import RSSParser, FeedFetcher, ArticleAnalyzer
+from app.services.llm_client import AnthropicClient
+from app.services.semantic_cache import SemanticCache
+from app.services.semantic_grouper import GROUPING_PROMPT, GROUPING_SYSTEM_PROMPT, SemanticGrouper
+from app.services.topic_analyzer import TopicAnalyzer, pick_thumbnail, tokenize
+from datetime import datetime, timedelta
 
+# Fixed timestamp for parsed entries that don't assert on dates
+_FIXED_TIME = datetime(2024, 1, 1)
 
-@pytest.fixture
-def app():
-    """Create test application."""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
+# A parsed feed entry as RSSParser.parse returns it; tests override guid/title/link
+_ENTRY = {
+    'guid': 'guid',
+    'title': 'Article',
+    'link': 'https://example.com/article',
+    'description': 'Desc',
+    'content': 'Content',
+    'author': 'Author',
+    'published_at': _FIXED_TIME,
+}
 
 
 @pytest.fixture
@@ -34,33 +40,40 @@ def sample_feed(app):
     return feed_id
 
 
+@pytest.fixture
+def rss_mock(monkeypatch):
+    """Replace RSSParser.parse as seen by the feed fetcher; set its return_value per test."""
+    mock = MagicMock()
+    monkeypatch.setattr('app.services.feed_fetcher.RSSParser.parse', mock)
+    return mock
+
+
 class TestRSSParser:
+    @patch('app.services.rss_parser.RSSParser.download', return_value=(b'<rss/>', None, None, {'content-location': 'https://example.com/rss'}))
     @patch('app.services.rss_parser.feedparser.parse')
-    def test_parse_valid_feed(self, mock_parse):
+    def test_parse_valid_feed(self, mock_parse, mock_download):
         """Test parsing a valid RSS feed."""
-        mock_parse.return_value = MagicMock(
+        # Real FeedParserDicts behave like feedparser's output without MagicMock overhead
+        mock_parse.return_value = FeedParserDict(
             bozo=False,
-            feed={'title': 'Test Feed', 'description': 'A test', 'link': 'https://example.com', 'language': 'en'},
+            feed=FeedParserDict(title='Test Feed', description='A test', link='https://example.com', language='en'),
             entries=[
-                MagicMock(
-                    get=lambda k, d='': {'id': 'guid1', 'title': 'Article 1', 'link': 'https://example.com/1', 'summary': 'Summary 1', 'author': 'Author'}.get(k, d),
-                    published_parsed=None,
-                    updated_parsed=None,
-                    content=None,
-                    summary='Summary 1'
-                )
+                FeedParserDict(id='guid1', title='Article 1', link='https://example.com/1', summary='Summary 1', author='Author')
             ]
         )
-        # Mock entry properly
-        mock_parse.return_value.entries[0].__contains__ = lambda self, k: k in ['id', 'title', 'link', 'summary', 'author']
 
         result = RSSParser.parse('https://example.com/rss')
 
+        mock_download.assert_called_once_with('https://example.com/rss', etag=None, modified=None)
+        mock_parse.assert_called_once_with(b'<rss/>', response_headers={'content-location': 'https://example.com/rss'})
         assert result['feed']['title'] == 'Test Feed'
         assert len(result['entries']) == 1
+        assert result['entries'][0]['guid'] == 'guid1'
+        assert result['entries'][0]['description'] == 'Summary 1'
 
+    @patch('app.services.rss_parser.RSSParser.download', return_value=(b'not a feed', None, None, {}))
     @patch('app.services.rss_parser.feedparser.parse')
-    def test_parse_invalid_feed(self, mock_parse):
+    def test_parse_invalid_feed(self, mock_parse, mock_download):
         """Test parsing an invalid feed raises error."""
         mock_parse.return_value = MagicMock(
             bozo=True,
@@ -71,24 +84,117 @@ class TestRSSParser:
         with pytest.raises(ValueError, match='Failed to parse feed'):
             RSSParser.parse('https://invalid.com/rss')
 
+    @patch('app.services.rss_parser.requests.get')
+    def test_parse_not_modified(self, mock_get):
+        """Test a 304 response to a conditional GET skips parsing."""
+        mock_get.return_value = MagicMock(status_code=304, headers={})
+
+        result = RSSParser.parse('https://example.com/rss', etag='"abc"', modified='Mon, 01 Jan 2024 00:00:00 GMT')
+
+        headers = mock_get.call_args.kwargs['headers']
+        assert headers['If-None-Match'] == '"abc"'
+        assert headers['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+        assert result['not_modified'] is True
+        assert result['entries'] == []
+        assert result['etag'] == '"abc"'
+
+    def test_parse_bytes(self):
+        """Test parsing an already downloaded feed document."""
+        body = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Bytes Feed</title>
+<item><guid>bytes-1</guid><title>Bytes &amp; Article</title><link>https://example.com/b</link></item>
+</channel></rss>"""
+
+        result = RSSParser.parse_bytes(body)
+
+        assert result['feed']['title'] == 'Bytes Feed'
+        assert result['entries'][0]['guid'] == 'bytes-1'
+        assert result['entries'][0]['title'] == 'Bytes & Article'
+
+    def test_parse_bytes_thumbnails(self):
+        """Test thumbnails come from enclosures or inline img tags."""
+        body = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Images</title>
+<item><guid>enc</guid><title>Enclosure</title>
+<enclosure url="https://example.com/enc.jpg" type="image/jpeg" length="1"/></item>
+<item><guid>img</guid><title>Inline</title>
+<description>&lt;p&gt;&lt;IMG alt="x" src="https://example.com/inline.png"&gt;&lt;/p&gt;</description></item>
+<item><guid>none</guid><title>Plain</title><description>No images here</description></item>
+</channel></rss>"""
+
+        thumbnails = {e['guid']: e['thumbnail'] for e in RSSParser.parse_bytes(body)['entries']}
+
+        assert thumbnails == {
+            'enc': 'https://example.com/enc.jpg',
+            'img': 'https://example.com/inline.png',
+            'none': '',
+        }
+
+    def test_parse_rss2_matches_feedparser(self):
+        """Test the RSS 2.0 fast path extracts the same entries as feedparser."""
+        body = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"
+     xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:media="http://search.yahoo.com/mrss/">
+<channel><title>Fast</title><link>https://example.com</link><language>en</language>
+<item><title>A &lt;b&gt;bold&lt;/b&gt; title</title><link>https://example.com/a</link><guid>fast-1</guid>
+<description><![CDATA[<p>Hi <script>alert(1)</script><a href="https://x.com" onclick="y()">there</a></p>]]></description>
+<content:encoded><![CDATA[<div><img src="https://example.com/i.jpg"> body</div>]]></content:encoded>
+<pubDate>Wed, 11 Jun 2003 09:30:00 +0200</pubDate><dc:creator>Jane</dc:creator></item>
+<item><guid>https://example.com/permalink</guid><media:thumbnail url="https://example.com/t.jpg"/></item>
+<item><guid>dc-date</guid><title>Dated</title><dc:date>2024-01-02T03:04:05+02:00</dc:date></item>
+<item><guid>encoded-only</guid><title>Encoded</title><content:encoded><![CDATA[<p>Body</p>]]></content:encoded></item>
+</channel></rss>"""
+
+        fast = RSSParser._parse_rss2(body)
+        with patch('app.services.rss_parser.RSSParser._parse_rss2', return_value=None):
+            slow = RSSParser.parse_bytes(body)
+
+        assert fast == slow
+        assert 'script' not in fast['entries'][0]['content'] + fast['entries'][0]['description']
+        assert fast['entries'][1]['link'] == 'https://example.com/permalink'
+        assert fast['entries'][2]['published_at'] is not None
+        assert fast['entries'][3]['description'] == 'Body'
+
+    @patch('app.services.rss_parser.requests.get')
+    def test_parse_resolves_relative_links(self, mock_get):
+        """Test relative item links and HTML URLs resolve against the feed URL on both parse paths."""
+        body = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Relative</title><link>/</link>
+<item><guid isPermaLink="false">rel-1</guid><title>Relative</title><link>/news/1</link>
+<description>&lt;a href="/more"&gt;More&lt;/a&gt; &lt;img src="img/1.jpg"&gt;</description></item>
+</channel></rss>"""
+        mock_get.return_value = MagicMock(
+            status_code=200, content=body, url='https://example.com/feeds/rss.xml',
+            headers={'Content-Type': 'application/rss+xml; charset=utf-8'},
+        )
+
+        fast = RSSParser.parse('https://example.com/feed')
+        with patch('app.services.rss_parser.RSSParser._parse_rss2', return_value=None):
+            slow = RSSParser.parse('https://example.com/feed')
+
+        assert fast == slow
+        entry = fast['entries'][0]
+        assert fast['feed']['link'] == 'https://example.com/'
+        assert entry['guid'] == 'rel-1'
+        assert entry['link'] == 'https://example.com/news/1'
+        assert 'href="https://example.com/more"' in entry['content']
+        assert entry['thumbnail'] == 'https://example.com/feeds/img/1.jpg'
+
+    def test_parse_rss2_skips_other_formats(self):
+        """Test Atom documents fall back to feedparser."""
+        body = b"""<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>Atom</title>
+<entry><id>atom-1</id><title>Atom Entry</title></entry></feed>"""
+
+        assert RSSParser._parse_rss2(body) is None
+        assert RSSParser.parse_bytes(body)['entries'][0]['guid'] == 'atom-1'
+
 
 class TestFeedFetcher:
-    @patch('app.services.feed_fetcher.RSSParser.parse')
-    def test_fetch_feed_new_articles(self, mock_parse, app, sample_feed):
+    def test_fetch_feed_new_articles(self, rss_mock, app, sample_feed):
         """Test fetching new articles."""
-        mock_parse.return_value = {
+        rss_mock.return_value = {
             'feed': {'title': 'Test'},
-            'entries': [
-                {
-                    'guid': 'new-guid-1',
-                    'title': 'New Article',
-                    'link': 'https://example.com/new',
-                    'description': 'New desc',
-                    'content': 'Content',
-                    'author': 'Author',
-                    'published_at': datetime.utcnow()
-                }
-            ]
+            'entries': [dict(_ENTRY, guid='new-guid-1', title='New Article', link='https://example.com/new')]
         }
 
         with app.app_context():
@@ -103,21 +209,11 @@ class TestFeedFetcher:
             assert article is not None
             assert article.title == 'New Article'
 
-    @patch('app.services.feed_fetcher.RSSParser.parse')
-    def test_fetch_feed_duplicate_articles(self, mock_parse, app, sample_feed):
+    def test_fetch_feed_duplicate_articles(self, rss_mock, app, sample_feed):
         """Test that duplicate articles are not created."""
-        entry_data = {
-            'guid': 'duplicate-guid',
-            'title': 'Article',
-            'link': 'https://example.com/dup',
-            'description': 'Desc',
-            'content': 'Content',
-            'author': 'Author',
-            'published_at': datetime.utcnow()
-        }
-        mock_parse.return_value = {
+        rss_mock.return_value = {
             'feed': {'title': 'Test'},
-            'entries': [entry_data]
+            'entries': [dict(_ENTRY, guid='duplicate-guid', link='https://example.com/dup')]
         }
 
         with app.app_context():
@@ -134,23 +230,33 @@ class TestFeedFetcher:
             # Only one article should exist
             count = Article.query.filter_by(guid='duplicate-guid').count()
             assert count == 1
+            assert db.session.get(Feed, sample_feed).article_count == 1
+
+    def test_fetch_feed_repeated_guid_in_document(self, rss_mock, app, sample_feed):
+        """Test a guid repeated within one feed document is stored once."""
+        entry_data = dict(_ENTRY, guid='repeated-guid', link='https://example.com/rep')
+        rss_mock.return_value = {
+            'feed': {'title': 'Test'},
+            'entries': [entry_data, dict(entry_data)]
+        }
 
-    @patch('app.services.feed_fetcher.RSSParser.parse')
-    def test_fetch_all_active(self, mock_parse, app, sample_feed):
+        with app.app_context():
+            feed = db.session.get(Feed, sample_feed)
+            new_count, updated_count = FeedFetcher.fetch_feed(feed)
+
+            assert (new_count, updated_count) == (1, 0)
+            assert Article.query.filter_by(guid='repeated-guid').count() == 1
+            # Bulk-inserted rows still get column defaults and count toward the feed
+            article = Article.query.filter_by(guid='repeated-guid').one()
+            assert article.fetched_at is not None
+            assert article.is_read is False
+            assert db.session.get(Feed, sample_feed).article_count == 1
+
+    def test_fetch_all_active(self, rss_mock, app, sample_feed):
         """Test fetching all active feeds."""
-        mock_parse.return_value = {
+        rss_mock.return_value = {
             'feed': {'title': 'Test'},
-            'entries': [
-                {
-                    'guid': 'batch-guid',
-                    'title': 'Batch Article',
-                    'link': 'https://example.com/batch',
-                    'description': 'Desc',
-                    'content': 'Content',
-                    'author': 'Author',
-                    'published_at': datetime.utcnow()
-                }
-            ]
+            'entries': [dict(_ENTRY, guid='batch-guid', title='Batch Article', link='https://example.com/batch')]
         }
 
         with app.app_context():
@@ -159,3 +265,370 @@ class TestFeedFetcher:
             assert results['total_new'] == 1
             assert len(results['feeds']) == 1
             assert len(results['errors']) == 0
+
+    @patch('app.services.rss_parser.requests.get')
+    def test_fetch_feed_conditional_get(self, mock_get, app, sample_feed):
+        """Test feed validators are stored and sent back on the next fetch."""
+        body = b"""<?xml version="1.0"?>
+        <rss version="2.0"><channel><title>Test</title>
+        <item><guid>cond-guid</guid><title>Cond</title><link>https://example.com/c</link></item>
+        </channel></rss>"""
+        mock_get.side_effect = [
+            MagicMock(status_code=200, content=body, url='https://example.com/rss', headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}),
+            MagicMock(status_code=304, headers={}),
+        ]
+
+        with app.app_context():
+            feed = db.session.get(Feed, sample_feed)
+            assert FeedFetcher.fetch_feed(feed) == (1, 0)
+            assert feed.etag == '"v1"'
+
+            assert FeedFetcher.fetch_feed(feed) == (0, 0)
+            assert mock_get.call_args.kwargs['headers']['If-None-Match'] == '"v1"'
+            assert feed.last_modified == 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+    def test_fetch_all_active_isolates_feed_errors(self, rss_mock, app, sample_feed):
+        """Test one failing download does not stop the other feeds."""
+        def parse(url, etag=None, modified=None):
+            if url == 'https://broken.example.com/rss':
+                raise ValueError('Failed to parse feed')
+            return {
+                'feed': {'title': 'Test'},
+                'entries': [dict(_ENTRY, guid='ok-guid', title='Ok Article', link='https://example.com/ok')]
+            }
+        rss_mock.side_effect = parse
+
+        with app.app_context():
+            db.session.add(Feed(name='Broken Feed', url='https://broken.example.com/rss', is_active=True))
+            db.session.commit()
+
+            results = FeedFetcher.fetch_all_active()
+
+            assert results['total_new'] == 1
+            assert [f['name'] for f in results['feeds']] == ['Test Feed']
+            assert results['errors'][0]['feed_name'] == 'Broken Feed'
+
+
+class TestArticleAnalyzer:
+    def test_analyze_pending(self, app, sample_feed):
+        """Test pending articles are analyzed in batches and results stored."""
+        with app.app_context():
+            for i in range(3):
+                db.session.add(Article(
+                    feed_id=sample_feed,
+                    guid=f'pending-guid-{i}',
+                    title=f'Pending Article {i}',
+                    fetched_at=datetime(2024, 1, 1, 12 - i)
+                ))
+            db.session.commit()
+
+            analyzer = ArticleAnalyzer(batch_size=2)
+            analyzer._client = MagicMock()
+            # Only the first article of each batch gets an analysis back
+            analyzer._client.complete_json.return_value = {
+                'analyses': [{'id': 0, 'category': 'Technology', 'sentiment': 'neutral', 'topics': ['tests']}]
+            }
+
+            stats = analyzer.analyze_pending(limit=10)
+
+            assert stats == {'processed': 3, 'succeeded': 2, 'failed': 1, 'skipped': 0}
+            assert analyzer._client.complete_json.call_count == 2
+
+            articles = {a.guid: a for a in Article.query.all()}
+            assert articles['pending-guid-0'].analysis_status == 'completed'
+            assert articles['pending-guid-0'].llm_category == 'Technology'
+            assert articles['pending-guid-0'].llm_metadata['topics'] == ['tests']
+            assert articles['pending-guid-0'].content_hash is not None
+            assert articles['pending-guid-1'].analysis_status == 'failed'
+            assert articles['pending-guid-2'].analysis_status == 'completed'
+
+    def test_analyze_pending_client_error_leaves_pending(self, app, sample_feed):
+        """Test a client that can't be created leaves articles pending rather than processing."""
+        with app.app_context():
+            db.session.add(Article(feed_id=sample_feed, guid='pending-guid', title='Pending Article'))
+            db.session.commit()
+
+            analyzer = ArticleAnalyzer()
+            with patch('app.services.article_analyzer.LLMClientFactory.create',
+                       side_effect=ImportError('anthropic package not installed')):
+                with pytest.raises(ImportError):
+                    analyzer.analyze_pending(limit=10)
+
+            assert Article.query.filter_by(guid='pending-guid').one().analysis_status == 'pending'
+
+    def test_pack_batches(self):
+        """Test batches are packed to the token budget and capped at batch_size."""
+        short = [Article(title='Short', description='x' * 40) for _ in range(5)]
+        long = [Article(title='Long', description='x' * 2000) for _ in range(3)]
+
+        analyzer = ArticleAnalyzer(batch_size=4, max_input_tokens=450)
+
+        assert [len(b) for b in analyzer.pack_batches(short)] == [4, 1]
+        # Each long article costs ~135 tokens, so only two fit the budget
+        assert [len(b) for b in analyzer.pack_batches(long)] == [2, 1]
+
+    def test_get_analysis_stats(self, app, sample_feed):
+        """Test status and category breakdowns come back from one query."""
+        with app.app_context():
+            db.session.add_all([
+                Article(feed_id=sample_feed, guid='s1', title='S1', analysis_status='completed', llm_category='Science'),
+                Article(feed_id=sample_feed, guid='s2', title='S2', analysis_status='completed', llm_category='Science'),
+                Article(feed_id=sample_feed, guid='s3', title='S3'),
+            ])
+            db.session.commit()
+
+            assert ArticleAnalyzer().get_analysis_stats() == {
+                'by_status': {'completed': 2, 'pending': 1},
+                'by_category': {'Science': 2},
+            }
+
+    def test_reanalyze_changed(self, app, sample_feed):
+        """Test only completed articles whose content changed go back to pending."""
+        with app.app_context():
+            unchanged = Article(feed_id=sample_feed, guid='same-guid', title='Same', analysis_status='completed')
+            changed = Article(feed_id=sample_feed, guid='changed-guid', title='Changed', analysis_status='completed')
+            unchanged.content_hash = ArticleAnalyzer.compute_content_hash(unchanged)
+            changed.content_hash = 'stale-hash'
+            db.session.add_all([unchanged, changed])
+            db.session.commit()
+
+            assert ArticleAnalyzer().reanalyze_changed() == 1
+
+            statuses = {a.guid: a.analysis_status for a in Article.query.all()}
+            assert statuses == {'same-guid': 'completed', 'changed-guid': 'pending'}
+
+
+class TestTopicAnalyzer:
+    def test_cluster_articles(self, app, sample_feed):
+        """Test articles sharing weighted terms cluster together and others stay apart."""
+        with app.app_context():
+            now = datetime.utcnow()
+            db.session.add_all([
+                Article(feed_id=sample_feed, guid='c1', title='Mars rover finds ancient lakebed',
+                        description='NASA rover discovers lakebed sediments on Mars', published_at=now),
+                Article(feed_id=sample_feed, guid='c2', title='Ancient Mars lakebed spotted by rover',
+                        description='Sediments suggest Mars lakebed held water', published_at=now - timedelta(hours=1)),
+                Article(feed_id=sample_feed, guid='c3', title='Stock markets rally on earnings',
+                        description='Investors cheer quarterly earnings', published_at=now - timedelta(hours=2)),
+            ])
+            db.session.commit()
+
+            clusters = TopicAnalyzer.cluster_articles(hours=24)
+
+            guids = sorted(sorted(a.guid for a in c['articles']) for c in clusters)
+            assert guids == [['c1', 'c2'], ['c3']]
+            mars = next(c for c in clusters if len(c['articles']) == 2)
+            assert mars['articles'][0].guid == 'c1'
+            assert {'mars', 'lakebed'} <= set(mars['keywords'])
+
+    def test_create_topics_keyword_fallback(self, app, sample_feed):
+        """Test keyword clusters become topics with ranked article links."""
+        with app.app_context():
+            now = datetime.utcnow()
+            db.session.add_all([
+                Article(feed_id=sample_feed, guid='k1', title='Glacier melt speeds up in Greenland',
+                        description='Greenland glacier melt accelerates', published_at=now),
+                Article(feed_id=sample_feed, guid='k2', title='Greenland glacier melt hits record',
+                        description='Record glacier melt in Greenland', published_at=now - timedelta(hours=1)),
+            ])
+            db.session.commit()
+
+            topics = TopicAnalyzer.create_topics(use_llm=False)
+
+            assert len(topics) == 1
+            links = sorted(ArticleTopic.query.all(), key=lambda link: -link.relevance_score)
+            assert [link.topic_id for link in links] == [topics[0].id] * 2
+            assert [link.relevance_score for link in links] == [1.0, 0.9]
+            assert topics[0].article_count == 2
+
+    @patch('app.services.llm_client.LLMClientFactory.is_available', return_value=True)
+    @patch('app.services.semantic_grouper.LLMClientFactory.create')
+    def test_create_topics_skips_llm_after_failure(self, mock_create, mock_available, app, sample_feed):
+        """Test a failed LLM grouping call falls back to keywords without more LLM calls."""
+        mock_create.return_value.complete.side_effect = TimeoutError('timed out')
+        with app.app_context():
+            now = datetime.utcnow()
+            db.session.add_all([
+                Article(feed_id=sample_feed, guid='f1', title='Volcano erupts on Iceland peninsula',
+                        description='Iceland volcano eruption', published_at=now, analysis_status='completed'),
+                Article(feed_id=sample_feed, guid='f2', title='Iceland volcano eruption forces evacuation',
+                        description='Volcano eruption in Iceland', published_at=now, analysis_status='completed'),
+            ])
+            db.session.commit()
+
+            with patch('app.services.topic_analyzer.TopicAnalyzer.generate_topic_title_llm') as mock_title:
+                topics = TopicAnalyzer.create_topics(use_llm=True)
+
+            assert len(topics) == 1
+            mock_create.return_value.complete.assert_called_once()
+            mock_create.return_value.complete_json.assert_not_called()
+            mock_title.assert_not_called()
+
+    def test_tokenize_strips_punctuation(self):
+        """Test ASCII and non-ASCII text drop punctuation the same way."""
+        assert tokenize("NASA's rover_cam found water!") == ['nasa', 'rover_cam', 'water']
+        assert tokenize('NASA’s rover—café found water!') == ['nasa', 'rover', 'café', 'water']
+
+    def test_pick_thumbnail(self):
+        """Test real images win over icons, which win over non-http URLs."""
+        articles = [Article(thumbnail=url) for url in (
+            None, 'data:image/png;base64,xx', 'https://cdn.example.com/site-LOGO.png', 'https://cdn.example.com/photo.jpg',
+        )]
+
+        assert pick_thumbnail(articles) == 'https://cdn.example.com/photo.jpg'
+        assert pick_thumbnail(articles[:3]) == 'https://cdn.example.com/site-LOGO.png'
+        assert pick_thumbnail(articles[:2]) is None
+
+    def test_generate_summary(self):
+        """Test extractive summaries are built from tag-free description sentences."""
+        articles = [
+            Article(title='Mars rover', description='<p>The Mars rover found an ancient lakebed near the crater.</p> Short.'),
+            Article(title='Lakebed', description='Scientists say the &amp; lakebed on Mars once held liquid water.'),
+        ]
+
+        summary = TopicAnalyzer.generate_summary(articles)
+
+        assert '<' not in summary and '&amp;' not in summary
+        assert 'The Mars rover found an ancient lakebed near the crater' in summary
+        assert summary.endswith('.')
+
+
+class TestSemanticGrouper:
+    def test_group_articles(self, app, sample_feed):
+        """Test LLM groups map back to Article objects and unknown ids are dropped."""
+        with app.app_context():
+            articles = [
+                Article(feed_id=sample_feed, guid=f'sg{i}', title=f'Grouped {i}', analysis_status='completed',
+                        llm_metadata={'topics': ['t']}, published_at=datetime(2024, 1, 1, i))
+                for i in range(3)
+            ]
+            db.session.add_all(articles)
+            db.session.commit()
+            ids = [a.id for a in articles]
+
+            grouper = SemanticGrouper()
+            grouper._client = MagicMock()
+            grouper._client.complete.return_value = (
+                f"Pair; with semicolon;World;0.9;{ids[2]}, {ids[0]},9999\n"
+                f"Too small;World;0.5;{ids[1]}\n"
+                "not a group line\n"
+            )
+
+            groups = grouper.group_articles(hours=24)
+
+            assert len(groups) == 1
+            assert [a.guid for a in groups[0]['articles']] == ['sg2', 'sg0']
+            assert groups[0]['title'] == 'Pair; with semicolon'
+            assert groups[0]['importance'] == 0.9
+            assert f"{ids[1]}||Grouped 1" in grouper._client.complete.call_args.args[0]
+
+    def test_group_articles_prompt_budget(self, app, sample_feed):
+        """Test the oldest articles are dropped when the prompt exceeds the token budget."""
+        with app.app_context():
+            db.session.add_all([
+                Article(feed_id=sample_feed, guid=f'b{i}', title=f'Budget {i} ' + 'x' * 100,
+                        analysis_status='completed', published_at=datetime(2024, 1, 1, i))
+                for i in range(10)
+            ])
+            db.session.commit()
+
+            grouper = SemanticGrouper()
+            grouper._client = MagicMock()
+            grouper._client.complete.return_value = ""
+            fixed = ArticleAnalyzer._estimate_tokens(GROUPING_SYSTEM_PROMPT + GROUPING_PROMPT)
+
+            with patch('app.services.semantic_grouper.MAX_INPUT_TOKENS', fixed + 100):
+                grouper.group_articles(hours=24)
+
+            prompt = grouper._client.complete.call_args.args[0]
+            assert prompt.startswith('Analyze these 3 news articles')
+            assert 'Budget 9 ' in prompt and 'Budget 7 ' in prompt and 'Budget 6 ' not in prompt
+
+    def test_create_topics_from_groups(self, app, sample_feed):
+        """Test batched summaries land on the right topics, with extractive fallback."""
+        with app.app_context():
+            titles = ['Volcano erupts', 'Volcano ash cloud', 'Election results', 'Election turnout']
+            articles = [
+                Article(feed_id=sample_feed, guid=f'g{i}', title=t, description=f'{t} description')
+                for i, t in enumerate(titles)
+            ]
+            db.session.add_all(articles)
+            db.session.commit()
+
+            grouper = SemanticGrouper()
+            grouper._client = MagicMock()
+            # The model only answers the first cluster of the batch
+            grouper._client.complete_json.return_value = {
+                'clusters': [{'id': 0, 'title': 'Volcano', 'summary': 'Lava everywhere.'}]
+            }
+            groups = [
+                {'title': 'First', 'articles': articles[:2], 'category': 'World', 'importance': 0.7},
+                {'title': 'Second', 'articles': articles[2:], 'category': 'Science', 'importance': 0.6},
+            ]
+
+            topics = grouper.create_topics_from_groups(groups)
+
+            assert [t.llm_summary for t in topics] == ['Lava everywhere.', 'Election results description']
+            assert grouper._client.complete_json.call_count == 1
+            prompt = grouper._client.complete_json.call_args.args[0]
+            assert '### Cluster 1' in prompt and 'Topic: Second' in prompt
+            assert [t.article_count for t in topics] == [2, 2]
+
+            # A near-identical group reuses the cached answer without another call
+            again = grouper.generate_titles_and_summaries([articles[:2]])
+            assert again == [('Volcano', 'Lava everywhere.')]
+            assert grouper._client.complete_json.call_count == 1
+
+    def test_generate_titles_and_summaries_chunks(self, app, sample_feed):
+        """Test clusters are split across prompts of CLUSTERS_PER_PROMPT."""
+        with app.app_context():
+            clusters = [[Article(title=f'Unique{i} headline{i}')] for i in range(12)]
+
+            grouper = SemanticGrouper()
+            grouper._client = MagicMock()
+            grouper._client.complete_json.side_effect = lambda prompt, **kwargs: {
+                'clusters': [{'id': i, 'title': f'T{i}', 'summary': 'S'} for i in range(prompt.count('### Cluster'))]
+            }
+
+            results = grouper.generate_titles_and_summaries(clusters)
+
+            assert grouper._client.complete_json.call_count == 2
+            assert [title for title, _ in results] == [f'T{i}' for i in range(10)] + ['T0', 'T1']
+
+
+class TestSemanticCache:
+    def test_similar_inputs_hit(self):
+        """Test lookups hit on near-duplicate token lists and miss otherwise."""
+        cache = SemanticCache(threshold=0.75)
+        cache.set(['mars', 'rover', 'lakebed', 'sediments', 'nasa'], 'cached')
+
+        assert cache.get(['mars', 'rover', 'lakebed', 'sediments', 'water']) == 'cached'
+        assert cache.get(['stock', 'markets', 'rally']) is None
+        assert cache.get([]) is None
+
+    def test_entries_expire(self):
+        """Test entries are dropped after the TTL."""
+        cache = SemanticCache(ttl=0)
+        cache.set(['mars'], 'cached')
+
+        assert cache.get(['mars']) is None
+
+
+class TestLLMClient:
+    def test_anthropic_schema_uses_forced_tool_call(self):
+        """Test a reply schema makes Claude answer through a forced tool call."""
+        client = AnthropicClient.__new__(AnthropicClient)
+        client.model = 'test-model'
+        client.client = MagicMock()
+        client.client.messages.create.return_value = MagicMock(content=[
+            MagicMock(type='tool_use', input={'analyses': [{'id': 0}]})
+        ])
+        schema = {'type': 'object', 'properties': {'analyses': {'type': 'array'}}}
+
+        result = client.complete_json('prompt', system='sys', schema=schema)
+
+        kwargs = client.client.messages.create.call_args.kwargs
+        assert result == {'analyses': [{'id': 0}]}
+        assert kwargs['tools'][0]['input_schema'] == schema
+        assert kwargs['tool_choice'] == {'type': 'tool', 'name': kwargs['tools'][0]['name']}
+        assert kwargs['system'] == 'sys'
@@ -1,13 +1,17 @@
 """WSGI entry point for production deployment."""
 import os
-from dotenv import load_dotenv
-load_dotenv()
+
+# Hosts like Render inject the environment directly; LOAD_DOTENV=false skips reading .env
+if os.getenv('LOAD_DOTENV', 'true').lower() == 'true':
+    from dotenv import load_dotenv
+    load_dotenv()
 
 from app import create_app
-from app.scheduler import init_scheduler
 
 app = create_app()
 
 # Initialize scheduler for background feed fetching in production
 if os.getenv('ENABLE_SCHEDULER', 'true').lower() == 'true':
+    # Imported here so workers without a scheduler never load APScheduler
+    from app.scheduler import init_scheduler
     init_scheduler(app)